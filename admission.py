@@ -0,0 +1,176 @@
+"""
+Admission control for Sachin's expensive routes.
+
+Each route gets a bounded number of active slots and a bounded wait queue.
+Waiters are ordered by priority (for timed games, the remaining clock of the
+side to move, so games close to flagging go first). As the queue fills up,
+requests are told to degrade when they are admitted: first to policy-only
+move selection, then to heuristic-only. When the queue is full, a newcomer
+more urgent than the least urgent waiter takes that waiter's place, and
+whichever request is turned away is dealt with by route: critical routes (bot
+moves) are never rejected and are served immediately on the cheapest path,
+non-critical routes (hints) are shed with an Overloaded error.
+"""
+
+import heapq
+import itertools
+import time
+from threading import Condition
+
+import config
+
+FULL = 'full'
+POLICY = 'policy'
+HEURISTIC = 'heuristic'
+
+
+class Overloaded(Exception):
+    def __init__(self, route, retry_after):
+        super().__init__(f"{route} is overloaded")
+        self.route = route
+        self.retry_after = retry_after
+
+
+class Ticket:
+    def __init__(self, gate, mode, queued):
+        self.gate = gate
+        self.mode = mode
+        self.queued = queued
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.gate.release(self.queued)
+        return False
+
+
+class RouteGate:
+    def __init__(self, route, max_active, max_queue, critical, max_wait, degrade_policy_at, degrade_heuristic_at):
+        self.route = route
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.critical = critical
+        self.max_wait = max_wait
+        self.degrade_policy_at = degrade_policy_at
+        self.degrade_heuristic_at = degrade_heuristic_at
+        self.cond = Condition()
+        self.active = 0
+        self.waiting = []
+        # Waiters displaced from a full queue by more urgent newcomers
+        self.evicted = set()
+        self.sequence = itertools.count()
+        self.admitted = 0
+        self.shed = 0
+        self.degraded = {POLICY: 0, HEURISTIC: 0}
+        self.bypassed = 0
+        self.evictions = 0
+
+    def _mode(self):
+        # Degrade by how full the wait queue is
+        load = len(self.waiting) / self.max_queue if self.max_queue else 1.0
+        if load >= self.degrade_heuristic_at:
+            return HEURISTIC
+        if load >= self.degrade_policy_at:
+            return POLICY
+        return FULL
+
+    def _admitted(self, mode, queued):
+        self.admitted += 1
+        if mode != FULL:
+            self.degraded[mode] += 1
+        return Ticket(self, mode, queued)
+
+    def _turned_away(self):
+        if not self.critical:
+            self.shed += 1
+            raise Overloaded(self.route, config.ADMISSION['retry_after'])
+        # Critical work isn't turned away, it skips the queue on the cheapest path
+        self.bypassed += 1
+        return self._admitted(HEURISTIC, False)
+
+    def admit(self, priority):
+        with self.cond:
+            if self.active < self.max_active and not self.waiting:
+                self.active += 1
+                return self._admitted(self._mode(), True)
+
+            entry = (priority, next(self.sequence))
+            if len(self.waiting) >= self.max_queue:
+                # Make room by displacing the least urgent waiter, if this request is more urgent
+                least = max(self.waiting) if self.waiting else None
+                if least is None or least[0] <= priority:
+                    return self._turned_away()
+                self.waiting.remove(least)
+                heapq.heapify(self.waiting)
+                self.evicted.add(least)
+                self.evictions += 1
+                self.cond.notify_all()
+
+            heapq.heappush(self.waiting, entry)
+            deadline = None if self.max_wait is None else time.monotonic() + self.max_wait
+            while True:
+                if entry in self.evicted:
+                    self.evicted.discard(entry)
+                    return self._turned_away()
+                if self.waiting[0] == entry and self.active < self.max_active:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.waiting.remove(entry)
+                    heapq.heapify(self.waiting)
+                    self.cond.notify_all()
+                    self.shed += 1
+                    raise Overloaded(self.route, config.ADMISSION['retry_after'])
+                self.cond.wait(remaining)
+
+            heapq.heappop(self.waiting)
+            self.active += 1
+            self.cond.notify_all()
+            # Degrade by the queue left behind now, not by how long it was when this request joined
+            return self._admitted(self._mode(), True)
+
+    def release(self, queued):
+        if not queued:
+            return
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            return {
+                'active': self.active,
+                'queue_depth': len(self.waiting),
+                'max_active': self.max_active,
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'shed': self.shed,
+                'degraded': dict(self.degraded),
+                'bypassed': self.bypassed,
+                'evictions': self.evictions,
+            }
+
+
+class AdmissionController:
+    def __init__(self, params=None):
+        params = params or config.ADMISSION
+        self.gates = {
+            route: RouteGate(
+                route,
+                limits['max_active'],
+                limits['max_queue'],
+                limits['critical'],
+                limits['max_wait'],
+                params['degrade_policy_at'],
+                params['degrade_heuristic_at'],
+            )
+            for route, limits in params['routes'].items()
+        }
+
+    def admit(self, route, priority=float('inf')):
+        # Lower priority values are served first
+        return self.gates[route].admit(priority)
+
+    def stats(self):
+        return {route: gate.stats() for route, gate in self.gates.items()}
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Per-user game analytics for Sachin.
+
+Aggregates are updated incrementally as each game finishes (results by
+opening prefix, colour and time control, game length and bot think time) and
+stored next to the user's stats in memory/<user>/analytics.json. Serving them
+is a dictionary lookup; the archive is only scanned by the one-off backfill:
+
+    python analytics.py --backfill
+"""
+
+import argparse
+import json
+import os
+from threading import RLock
+
+import chess
+import chess.pgn
+
+import config
+from models import valid_username
+
+BOT_NAME = 'Sachin'
+BUCKETS = ('by_color', 'by_time_control', 'by_opening')
+
+
+def empty_bucket():
+    return {'games': 0, 'wins': 0, 'draws': 0, 'losses': 0, 'win_rate': 0.0}
+
+
+def empty_aggregates():
+    return {
+        'games': 0,
+        'wins': 0,
+        'draws': 0,
+        'losses': 0,
+        'total_plies': 0,
+        'average_game_length': 0.0,
+        'bot_think_time': 0.0,
+        'bot_moves': 0,
+        'average_bot_think_time': 0.0,
+        'by_color': {},
+        'by_time_control': {},
+        'by_opening': {},
+    }
+
+
+def human_outcome(result, human_color):
+    # Outcome from the human's point of view, matching stats.json
+    if result == '1/2-1/2':
+        return 'draws'
+    if (result == '1-0') == (human_color == chess.WHITE):
+        return 'wins'
+    return 'losses'
+
+
+def time_control_header(timers_enabled, seconds):
+    # PGN TimeControl tag: base time in seconds, or '-' for untimed games
+    return str(int(seconds)) if timers_enabled else '-'
+
+
+def time_control_from_header(value):
+    if not value or value == '?':
+        return 'unknown'
+    if value == '-':
+        return 'No limit'
+    try:
+        return f"{int(value.split('+')[0]) // 60} min"
+    except ValueError:
+        return 'unknown'
+
+
+def opening_prefixes(moves, max_plies):
+    # SAN prefixes of the first plies, e.g. 'e4', 'e4 e5', 'e4 e5 Nf3'
+    board = chess.Board()
+    sans = []
+    prefixes = []
+    for move in moves[:max_plies]:
+        sans.append(board.san(move))
+        board.push(move)
+        prefixes.append(' '.join(sans))
+    return prefixes
+
+
+class GameAnalytics:
+    def __init__(self, memory_dir=config.MEMORY_DIR, opening_plies=config.ANALYTICS_PARAMS['opening_plies']):
+        self.memory_dir = memory_dir
+        self.opening_plies = opening_plies
+        self.aggregates = {}
+        # Read-only views handed out to the API, rebuilt whenever a game is recorded. Buckets
+        # are replaced rather than updated in place, so a view shares every untouched bucket
+        self.published = {}
+        self.lock = RLock()
+
+    def user_dir(self, username):
+        # Usernames become directory names, anything outside the pattern could escape memory_dir
+        if not valid_username(username):
+            raise ValueError(f"Invalid username: {username!r}")
+        return os.path.join(self.memory_dir, username)
+
+    def analytics_file(self, username):
+        return os.path.join(self.user_dir(username), 'analytics.json')
+
+    def load(self, username):
+        with self.lock:
+            try:
+                with open(self.analytics_file(username), 'r') as f:
+                    self.aggregates[username] = json.load(f)
+            except FileNotFoundError:
+                self.aggregates[username] = empty_aggregates()
+            self._publish(username)
+
+    def _publish(self, username):
+        agg = self.aggregates[username]
+        view = dict(agg)
+        for name in BUCKETS:
+            view[name] = dict(agg[name])
+        self.published[username] = view
+
+    def save(self, username):
+        with self.lock:
+            if username not in self.aggregates:
+                return
+            payload = json.dumps(self.aggregates[username])
+        os.makedirs(self.user_dir(username), exist_ok=True)
+        with open(self.analytics_file(username), 'w') as f:
+            f.write(payload)
+
+    def get(self, username):
+        if username not in self.published:
+            self.load(username)
+        return self.published[username]
+
+    def _add(self, buckets, key, outcome):
+        bucket = dict(buckets.get(key) or empty_bucket())
+        bucket['games'] += 1
+        bucket[outcome] += 1
+        bucket['win_rate'] = bucket['wins'] / bucket['games']
+        buckets[key] = bucket
+
+    def record_game(self, username, human_color, time_control, result, moves,
+                    bot_think_time=0.0, bot_moves=0, backfill=False):
+        if result not in ('1-0', '0-1', '1/2-1/2'):
+            return
+
+        outcome = human_outcome(result, human_color)
+        prefixes = opening_prefixes(moves, self.opening_plies)
+
+        with self.lock:
+            if username not in self.aggregates:
+                if backfill:
+                    self.aggregates[username] = empty_aggregates()
+                else:
+                    self.load(username)
+            agg = self.aggregates[username]
+
+            agg['games'] += 1
+            agg[outcome] += 1
+            agg['total_plies'] += len(moves)
+            agg['average_game_length'] = agg['total_plies'] / agg['games']
+            agg['bot_think_time'] += bot_think_time
+            agg['bot_moves'] += bot_moves
+            if agg['bot_moves']:
+                agg['average_bot_think_time'] = agg['bot_think_time'] / agg['bot_moves']
+
+            color = 'white' if human_color == chess.WHITE else 'black'
+            self._add(agg['by_color'], color, outcome)
+            self._add(agg['by_time_control'], time_control, outcome)
+            for prefix in prefixes:
+                self._add(agg['by_opening'], prefix, outcome)
+
+            if not backfill:
+                self._publish(username)
+
+    def record_pgn(self, game, backfill=False):
+        # Fold one archived game into the aggregates, returns the username or None
+        headers = game.headers
+        if headers.get('White') == BOT_NAME:
+            username, human_color = headers.get('Black'), chess.BLACK
+        elif headers.get('Black') == BOT_NAME:
+            username, human_color = headers.get('White'), chess.WHITE
+        else:
+            return None
+        if not valid_username(username):
+            return None  # a hand-edited header, it has nowhere safe to be stored
+
+        moves = []
+        bot_think_time = 0.0
+        bot_moves = 0
+        board = game.board()
+        for node in game.mainline():
+            if board.turn != human_color:
+                emt = node.emt()
+                if emt is not None:
+                    bot_think_time += emt
+                    bot_moves += 1
+            moves.append(node.move)
+            board.push(node.move)
+
+        self.record_game(
+            username,
+            human_color,
+            time_control_from_header(headers.get('TimeControl')),
+            headers.get('Result', '*'),
+            moves,
+            bot_think_time,
+            bot_moves,
+            backfill=backfill
+        )
+        return username
+
+    def backfill(self, games_dir=config.GAMES_DIR):
+        # Rebuild every user's aggregates in a single streaming pass over the archive
+        with self.lock:
+            self.aggregates = {}
+            self.published = {}
+
+        users = set()
+        processed = 0
+        for filename in sorted(os.listdir(games_dir)):
+            if not filename.endswith('.pgn'):
+                continue
+            with open(os.path.join(games_dir, filename), 'r') as f:
+                while True:
+                    game = chess.pgn.read_game(f)
+                    if game is None:
+                        break
+                    username = self.record_pgn(game, backfill=True)
+                    if username:
+                        users.add(username)
+                        processed += 1
+
+        for username in users:
+            with self.lock:
+                self._publish(username)
+            self.save(username)
+
+        return processed, users
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build per-user game analytics')
+    parser.add_argument('--backfill', action='store_true', help='rebuild analytics from the games archive')
+    parser.add_argument('--games-dir', default=config.GAMES_DIR)
+    args = parser.parse_args()
+
+    if not args.backfill:
+        parser.print_help()
+        return
+
+    analytics = GameAnalytics()
+    processed, users = analytics.backfill(args.games_dir)
+    print(f"📈 Backfilled analytics from {processed} games for {len(users)} users")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
+import gzip
 from flask_cors import CORS
 import chess
 import chess.pgn
@@ -7,7 +8,6 @@ import pickle
 import json
 from datetime import datetime
 import random
-from collections import defaultdict
 import time
 import atexit
 import subprocess
@@ -16,16 +16,63 @@ from threading import Thread, RLock
 import uuid
 from time import time as current_time
 
+import config
+from admission import AdmissionController, Overloaded, FULL, HEURISTIC
+from analytics import GameAnalytics, time_control_header, time_control_from_header
+from encoding import pack_game, append_record
+from evaluation import Evaluator
+from canonical import policy_key, to_canonical_uci, from_canonical_uci, is_canonical, migrate_policy
+from explorer import ExplorerIndex
+from export import game_filter, parse_date, pgn_stream, zip_stream, policy_stream, USER_RESULTS, PGN_RESULTS
+from finalizer import GameFinalizer
+from learner import PolicyLearner
+from maintenance import PolicyMaintainer
+from policy_store import PolicyStore, PolicyFileWatcher
+from position_cache import PositionCache
+from search import ParallelSearcher
+from models import GameState, UserStats, valid_username
+from snapshots import GameSnapshotter
+from tablebase import EndgameTables
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'
 CORS(app)
 
+# Clock for each timed control, anything else is untimed
+TIME_CONTROL_SECONDS = {
+    '1 min': 60,
+    '3 min': 180,
+    '5 min': 300,
+    '10 min': 600,
+    '30 min': 1800
+}
+
 # Global variables for game state and policies
 games = {}
 policies = {}
 stats = {}
+analytics = GameAnalytics()
+explorer = ExplorerIndex()
+position_cache = PositionCache()
+evaluator = Evaluator().load()
+endgame_tables = EndgameTables().load()
 games_lock = RLock()
 policy_lock = RLock()
+stats_lock = RLock()
+# Serialises policy and metadata files, saved by both the learner and the maintainer;
+# the file watcher holds it too, so it never sees a save that hasn't been marked yet
+policy_save_lock = RLock()
+snapshotter = GameSnapshotter(games, games_lock)
+admission = AdmissionController()
+
+# Search worker processes are forked here, before any background thread is running
+searcher = ParallelSearcher().start()
+atexit.register(searcher.stop)
 
 # Timer thread to check for expired games
 def timer_thread():
@@ -33,91 +80,24 @@ def timer_thread():
         try:
             current_time_val = current_time()
             with games_lock:
-                for game_id, game_state in list(games.items()):
-                    if (game_state['game_status'] == 'active' and 
-                        game_state['timers_enabled'] and
-                        game_state['last_move_time'] > 0):
-                        
-                        # Calculate elapsed time since last update
-                        elapsed = current_time_val - game_state['last_move_time']
-                        if elapsed > 0:
-                            # Update the current player's timer
-                            current_player = 'white' if game_state['board'].turn == chess.WHITE else 'black'
-                            game_state['timers'][current_player] = max(0, game_state['timers'][current_player] - elapsed)
-                            game_state['last_move_time'] = current_time_val
-                            
-                            # Check if time has expired
-                            if game_state['timers'][current_player] <= 0:
-                                # Time's up - current player loses
-                                game_state['game_status'] = 'finished'
-                                
-                                # Determine winner
-                                if current_player == 'white':
-                                    result = "0-1"  # Black wins
-                                    outcome = "Black wins"
-                                else:
-                                    result = "1-0"  # White wins
-                                    outcome = "White wins"
-                                
-                                # Update game headers
-                                game_state['game'].headers["Result"] = result
-                                
-                                # Update stats
-                                username = game_state['username']
-                                if username not in stats:
-                                    load_stats(username)
-                                
-                                if outcome == "White wins":
-                                    if game_state['human_color'] == chess.WHITE:
-                                        stats[username]['wins'] += 1
-                                        # Human won, bot lost
-                                        game_state['bot_loss_streak'] += 1
-                                        if game_state['bot_loss_streak'] >= 5:
-                                            game_state['learning_boost_active'] = True
-                                    else:
-                                        stats[username]['losses'] += 1
-                                        # Bot won, reset streak
-                                        game_state['bot_loss_streak'] = 0
-                                        game_state['learning_boost_active'] = False
-                                else:  # Black wins
-                                    if game_state['human_color'] == chess.BLACK:
-                                        stats[username]['wins'] += 1
-                                        # Human won, bot lost
-                                        game_state['bot_loss_streak'] += 1
-                                        if game_state['bot_loss_streak'] >= 5:
-                                            game_state['learning_boost_active'] = True
-                                    else:
-                                        stats[username]['losses'] += 1
-                                        # Bot won, reset streak
-                                        game_state['bot_loss_streak'] = 0
-                                        game_state['learning_boost_active'] = False
-                                
-                                stats[username]['games_played'] += 1
-                                
-                                # Update learning policy only if user is jakhar
-                                if username.lower() == "jakhar":
-                                    with policy_lock:
-                                        update_policy(
-                                            username, 
-                                            outcome, 
-                                            [m['move'] for m in game_state['move_history']], 
-                                            game_state['human_color'],
-                                            game_state['learning_boost_active']
-                                        )
-                                
-                                # Save game and stats
-                                save_game(game_state)
-                                save_stats(username)
+                timed_games = [g for g in games.values() if g.game_status == 'active' and g.timers_enabled]
+            
+            for game_state in timed_games:
+                # A game held by a bot search is skipped, the bot's clock isn't charged anyway
+                if not game_state.lock.acquire(blocking=False):
+                    continue
+                try:
+                    if game_state.game_status == 'active' and game_state.last_move_time > 0:
+                        # Charges the side to move and finalises the game if their flag falls
+                        charge_clock(game_state, current_time_val)
+                finally:
+                    game_state.lock.release()
             
             time.sleep(0.1)  # Check more frequently
         except Exception as e:
             print(f"Error in timer thread: {e}")
             time.sleep(1)
 
-# Start the timer thread
-timer_thread = Thread(target=timer_thread, daemon=True)
-timer_thread.start()
-
 # Initialize policies and stats
 def initialize_data():
     # Create directories if they don't exist
@@ -129,27 +109,64 @@ def initialize_data():
     # Load jakhar's policy and stats
     load_policy("jakhar")
     load_stats("jakhar")
+    
+    # Open the explorer index, games saved since it was last written are added in the background
+    explorer.open().start()
+    
+    # Bring back games that were in progress when the server stopped
+    snapshotter.restore()
+    snapshotter.start()
+    atexit.register(snapshotter.snapshot)
 
-def load_policy(username):
-    policy_file = f"memory/{username}/policy.pkl"
+def checked_username(username):
+    # Usernames become file and directory names, so they are checked before any path is built
+    if not valid_username(username):
+        raise ValueError(f"Invalid username: {username!r}")
+    return username
+
+def user_dir(username):
+    return f"memory/{checked_username(username)}"
+
+def get_policy_file(username):
+    policy_file = f"{user_dir(username)}/policy.pkl"
     
     # If user is not jakhar, try to load jakhar's policy
     if username.lower() != "jakhar" and not os.path.exists(policy_file):
         policy_file = "memory/jakhar/policy.pkl"
+    return policy_file
+
+def load_policy(username):
+    policy_file = get_policy_file(username)
+    policy_dict = {}
     
     try:
         with open(policy_file, "rb") as f:
             policy_dict = pickle.load(f)
-            policies[username] = defaultdict(lambda: defaultdict(int))
-            for k, v in policy_dict.items():
-                policies[username][k] = defaultdict(int, v)
-            print(f"📂 Loaded policy for {username} with {len(policies[username])} states")
+            
+            # Tables saved before canonical keys are folded on load
+            if not is_canonical(policy_dict):
+                legacy_states = len(policy_dict)
+                policy_dict = migrate_policy(policy_dict)
+                print(f"🔄 Migrated {username}'s policy to canonical keys: {legacy_states} -> {len(policy_dict)} states")
+            
+            print(f"📂 Loaded policy for {username} with {len(policy_dict)} states")
     except FileNotFoundError:
-        policies[username] = defaultdict(lambda: defaultdict(int))
         print(f"📂 No existing policy found for {username}, starting fresh")
+    
+    # A reload publishes a new version to readers of the existing store
+    with policy_lock:
+        if username in policies:
+            policies[username].replace(policy_dict)
+        else:
+            policies[username] = PolicyStore(policy_dict, lock=policy_lock)
+    policy_watcher.mark(username, policy_file)
+    
+    # Aging metadata is only kept for policies that learn
+    if username.lower() == "jakhar":
+        maintainer.load(username)
 
 def load_stats(username):
-    stats_file = f"memory/{username}/stats.json"
+    stats_file = f"{user_dir(username)}/stats.json"
     
     # If user is not jakhar, try to load jakhar's stats
     if username.lower() != "jakhar" and not os.path.exists(stats_file):
@@ -157,56 +174,128 @@ def load_stats(username):
     
     try:
         with open(stats_file, "r") as f:
-            stats[username] = json.load(f)
-            print(f"📊 Loaded stats for {username}: {stats[username]}")
+            user_stats = UserStats.from_dict(json.load(f))
+            print(f"📊 Loaded stats for {username}: {user_stats.to_dict()}")
     except FileNotFoundError:
-        stats[username] = {'wins': 0, 'losses': 0, 'draws': 0, 'games_played': 0}
+        user_stats = UserStats()
         print(f"📊 No existing stats found for {username}, starting fresh")
+    
+    # Keep counters a concurrent finalisation may already have bumped
+    with stats_lock:
+        return stats.setdefault(username, user_stats)
 
 def save_policy(username):
-    with policy_lock:
-        if username in policies:
-            # Convert defaultdict to regular dict for serialization
-            policy_dict = {k: dict(v) for k, v in policies[username].items()}
-            
-            # Save policy for the current user
-            policy_file = f"memory/{username}/policy.pkl"
-            with open(policy_file, "wb") as f:
-                pickle.dump(policy_dict, f)
+    if username not in policies:
+        return
+    # Write to a temp file and swap it in, so readers never see a partial pickle
+    policy_file = f"{user_dir(username)}/policy.pkl"
+    tmp_file = f"{policy_file}.tmp"
+    with policy_save_lock:
+        # The snapshot is immutable, so it is serialised without the policy lock; taking it
+        # under the save lock means a slower save never writes an older table last
+        policy_dict = policies[username].snapshot().to_dict()
+        with open(tmp_file, "wb") as f:
+            pickle.dump(policy_dict, f)
+        os.replace(tmp_file, policy_file)
+        policy_watcher.mark(username, policy_file)
+        maintainer.save(username)
 
 def save_stats(username):
-    if username in stats:
-        stats_file = f"memory/{username}/stats.json"
-        with open(stats_file, "w") as f:
-            json.dump(stats[username], f)
-
-def get_normalized_fen(board):
-    # Normalize FEN by removing move counters
-    return ' '.join(board.fen().split()[:4])
-
-def get_normalized_fen_from_board(board):
-    return ' '.join(board.fen().split()[:4])
-
-def get_bot_move(board, username, move_history):
-    fen = get_normalized_fen(board)
-    
-    # Check if we have policy for this position
-    if username in policies and fen in policies[username] and policies[username][fen]:
-        moves, weights = zip(*policies[username][fen].items())
-        # Filter to only legal moves
-        legal_moves = [m for m in moves if chess.Move.from_uci(m) in board.legal_moves]
-        legal_weights = [policies[username][fen][m] for m in legal_moves]
+    with stats_lock:
+        if username not in stats:
+            return
+        stats_dict = stats[username].to_dict()
+    
+    # Only jakhar's directory is created at startup
+    os.makedirs(user_dir(username), exist_ok=True)
+    stats_file = f"{user_dir(username)}/stats.json"
+    with open(stats_file, "w") as f:
+        json.dump(stats_dict, f)
+
+def get_user_stats(username):
+    with stats_lock:
+        user_stats = stats.get(username)
+        return user_stats.to_dict() if user_stats else UserStats().to_dict()
+
+def get_policy_key(board):
+    # Canonical policy key, colour-mirrored positions share an entry
+    return policy_key(board)
+
+def get_policy_weights(board, username):
+    # Learned weights for the moves in this position, without inserting into the table
+    if username not in policies:
+        return {}
+    key, flipped = get_policy_key(board)
+    entry = policies[username].snapshot().get(key, {})
+    return {from_canonical_uci(m, flipped).uci(): w for m, w in entry.items()}
+
+def get_bot_move(board, username, move_history, mode=FULL, time_control=None):
+    return choose_bot_move(board, username, move_history, mode, time_control)[0]
+
+def choose_bot_move(board, username, move_history, mode=FULL, time_control=None):
+    # (move, source), the source is one of models.MOVE_SOURCES
+    # Covered endings are played straight from the tables
+    move = endgame_tables.best_move(board)
+    if move is not None:
+        return move, 'tablebase'
+    
+    key, flipped = get_policy_key(board)
+    
+    # Check if we have policy for this position, skipped when degraded to heuristic-only
+    store = policies.get(username) if mode != HEURISTIC else None
+    entry = store.snapshot().get(key) if store is not None else None
+    if entry:
+        # Translate back to this board's frame and filter to only legal moves
+        legal_moves = []
+        legal_weights = []
+        position_moves = position_cache.legal_moves(board)
+        for move_uci, weight in entry.items():
+            move = from_canonical_uci(move_uci, flipped)
+            if move in position_moves:
+                legal_moves.append(move)
+                legal_weights.append(weight)
         
         if legal_moves and sum(legal_weights) > 0:
-            move_uci = random.choices(legal_moves, weights=legal_weights, k=1)[0]
-            return chess.Move.from_uci(move_uci)
+            maintainer.touch(username, key)
+            return random.choices(legal_moves, weights=legal_weights, k=1)[0], 'policy'
+    
+    # Long games can afford a real search, but not when admission has degraded the request
+    if mode == FULL and time_control in config.SEARCH_PARAMS['time_controls']:
+        result = searcher.search(board, config.SEARCH_PARAMS['max_depth'], config.SEARCH_PARAMS['time_limit'])
+        if result.move is not None:
+            return result.move, 'search'
     
     # Fallback to heuristic if no policy
-    return get_heuristic_move(board, move_history)
+    return get_heuristic_move(board, move_history), 'heuristic'
 
 def get_heuristic_move(board, move_history):
-    legal_moves = list(board.legal_moves)
-    scored_moves = []
+    entry = position_cache.entry(board)
+    legal_moves = entry.legal_moves
+    
+    # Per-move scores only depend on the position, so compute them once per position
+    if entry.scores is None:
+        entry.scores = score_heuristic_moves(board, legal_moves)
+    
+    # Prefer developing moves in early game
+    early_game = len(move_history) < 20
+    scored_moves = [(move, score + development if early_game else score)
+                    for move, score, development in entry.scores]
+    
+    # Sort by score and pick the best move
+    scored_moves.sort(key=lambda x: x[1], reverse=True)
+    best_score = scored_moves[0][1]
+    best_moves = [m for m, s in scored_moves if s == best_score]
+    
+    return random.choice(best_moves) if best_moves else random.choice(legal_moves)
+
+def score_heuristic_moves(board, legal_moves):
+    # Trained evaluation scores every child position in one batched call
+    if evaluator.available and legal_moves:
+        scores = evaluator.score_moves(board, legal_moves) / 100
+        return [(move, score, get_development_bonus(board, move))
+                for move, score in zip(legal_moves, scores.tolist())]
+    
+    scores = []
     
     for move in legal_moves:
         score = 0
@@ -223,26 +312,22 @@ def get_heuristic_move(board, move_history):
             score += 1
         board.pop()
         
-        # Prefer developing moves in early game
-        if len(move_history) < 20:
-            piece = board.piece_at(move.from_square)
-            if piece and piece.piece_type == chess.PAWN:
-                score -= 0.1
-            elif piece and piece.piece_type in [chess.KNIGHT, chess.BISHOP]:
-                score += 0.2
-        
-        scored_moves.append((move, score))
-    
-    # Sort by score and pick the best move
-    scored_moves.sort(key=lambda x: x[1], reverse=True)
-    best_score = scored_moves[0][1]
-    best_moves = [m for m, s in scored_moves if s == best_score]
+        scores.append((move, score, get_development_bonus(board, move)))
     
-    return random.choice(best_moves) if best_moves else random.choice(legal_moves)
+    return scores
 
-def get_hint_move(board, username, move_history):
+def get_development_bonus(board, move):
+    # Development bonus, only applied in the early game
+    piece_type = board.piece_type_at(move.from_square)
+    if piece_type == chess.PAWN:
+        return -0.1
+    elif piece_type in [chess.KNIGHT, chess.BISHOP]:
+        return 0.2
+    return 0
+
+def get_hint_move(board, username, move_history, mode=FULL):
     # Get the best move according to policy and heuristics
-    return get_bot_move(board, username, move_history)
+    return get_bot_move(board, username, move_history, mode)
 
 def get_piece_value(piece_type):
     values = {
@@ -255,17 +340,8 @@ def get_piece_value(piece_type):
     }
     return values.get(piece_type, 0)
 
-def update_policy(username, outcome, move_history, human_color, learning_boost_active=False):
-    if username.lower() != "jakhar":
-        return
-    
-    learning_params = {
-        'win_reward': 1,
-        'draw_reward': 0.5,
-        'loss_reward': -1,
-        'decay_factor': 0.9,
-        'window_size': 100,
-    }
+def get_policy_reward(outcome, human_color, learning_boost_active=False):
+    learning_params = config.LEARNING_PARAMS
     
     # Calculate dynamic rewards based on loss streak
     if learning_boost_active:
@@ -278,33 +354,204 @@ def update_policy(username, outcome, move_history, human_color, learning_boost_a
         draw_reward = learning_params['draw_reward']
         loss_reward = learning_params['loss_reward']
     
-    reward = 0
-    
     if outcome == "White wins":
-        reward = win_reward if human_color == chess.WHITE else loss_reward
+        return win_reward if human_color == chess.WHITE else loss_reward
     elif outcome == "Black wins":
-        reward = win_reward if human_color == chess.BLACK else loss_reward
+        return win_reward if human_color == chess.BLACK else loss_reward
     else:  # Draw
-        reward = draw_reward
+        return draw_reward
+
+def apply_policy_update(username, outcome, move_history, human_color, learning_boost_active=False):
+    # Update the in-memory policy for one finished game without saving it
+    if username.lower() != "jakhar":
+        return 0
+    
+    reward = get_policy_reward(outcome, human_color, learning_boost_active)
     
     # Replay the game and update policy for human moves
     temp_board = chess.Board()
     policy_updates = 0
     
-    for i, move in enumerate(move_history):
-        if temp_board.turn == human_color:
-            fen = get_normalized_fen_from_board(temp_board)
-            move_uci = move.uci()
-            policies[username][fen][move_uci] += reward
-            policy_updates += 1
+    if username not in policies:
+        load_policy(username)
+    
+    # The whole game is published to readers as one new policy version
+    with policies[username].write() as writer:
+        for move in move_history:
+            if temp_board.turn == human_color:
+                key, flipped = get_policy_key(temp_board)
+                move_uci = to_canonical_uci(move, flipped)
+                entry = writer.entry(key)
+                entry[move_uci] = entry.get(move_uci, 0) + reward
+                maintainer.touch(username, key)
+                policy_updates += 1
+            
+            temp_board.push(move)
         
-        temp_board.push(move)
+        maintainer.advance(username)
+    
+    return policy_updates
+
+def update_policy(username, outcome, move_history, human_color, learning_boost_active=False):
+    if username.lower() != "jakhar":
+        return
+    
+    policy_updates = apply_policy_update(username, outcome, move_history, human_color, learning_boost_active)
     
     # Save updated policy
     save_policy(username)
     
     print(f"📊 Policy updated with {policy_updates} moves. Total states: {len(policies[username])}")
 
+def apply_learning_record(record):
+    policy_updates = apply_policy_update(
+        record['username'],
+        record['outcome'],
+        record['moves'],
+        record['human_color'],
+        record['learning_boost_active']
+    )
+    print(f"📊 Policy updated with {policy_updates} moves. Total states: {len(policies[record['username']])}")
+
+def queue_policy_update(username, outcome, move_history, human_color, learning_boost_active=False):
+    # Hand the finished game to the background learner, this is just an enqueue
+    if username.lower() != "jakhar":
+        return
+    
+    learner.submit({
+        'username': username,
+        'outcome': outcome,
+        'moves': list(move_history),
+        'human_color': human_color,
+        'learning_boost_active': learning_boost_active
+    })
+
+def get_game(game_id):
+    with games_lock:
+        return games.get(game_id)
+
+def charge_clock(game_state, now=None):
+    # Charge the side to move for the time since the last update, caller holds game_state.lock.
+    # Returns the result if their flag fell, the game is finalised in that case
+    now = current_time() if now is None else now
+    turn = game_state.side_to_move()
+    elapsed = now - game_state.last_move_time
+    if elapsed > 0:
+        game_state.timers[turn] = max(0, game_state.timers[turn] - elapsed)
+        game_state.last_move_time = now
+    
+    if game_state.timers[turn] <= 0:
+        # Time's up - current player loses
+        result = "0-1" if turn == chess.WHITE else "1-0"
+        finalize_game(game_state, result)
+        return result
+    return None
+
+def finalize_game(game_state, result):
+    # Settle a finished game, caller holds game_state.lock. Only the in-memory
+    # bookkeeping happens here, disk writes and learning are queued
+    if game_state.finalized:
+        return False
+    game_state.finalized = True
+    game_state.game_status = 'finished'
+    game_state.headers["Result"] = result
+    
+    if result == "1-0":
+        outcome = "White wins"
+    elif result == "0-1":
+        outcome = "Black wins"
+    else:
+        outcome = "Draw"
+    
+    # Update stats
+    username = game_state.username
+    human_won = (outcome == "White wins" and game_state.human_color == chess.WHITE or
+                 outcome == "Black wins" and game_state.human_color == chess.BLACK)
+    if username not in stats:
+        load_stats(username)
+    with stats_lock:
+        user_stats = stats[username]
+        if outcome == "Draw":
+            user_stats.draws += 1
+        elif human_won:
+            user_stats.wins += 1
+        else:
+            user_stats.losses += 1
+        user_stats.games_played += 1
+    
+    if human_won:
+        # Human won, bot lost
+        game_state.bot_loss_streak += 1
+        if game_state.bot_loss_streak >= 5:
+            game_state.learning_boost_active = True
+    else:
+        # Bot won or drew, reset streak
+        game_state.bot_loss_streak = 0
+        game_state.learning_boost_active = False
+    
+    record = finished_game_record(game_state)
+    
+    # Update learning policy, queue_policy_update only accepts jakhar's games
+    queue_policy_update(username, outcome, record['moves'], record['human_color'], game_state.learning_boost_active)
+    
+    # Save game, analytics and stats in the background
+    finalizer.submit(record)
+    return True
+
+def finished_game_record(game_state):
+    # Copied out so later undos or moves on this game can't change what gets written
+    return {
+        'username': game_state.username,
+        'human_color': game_state.human_color,
+        'time_control': game_state.time_control,
+        'timers_enabled': game_state.timers_enabled,
+        'result': game_state.headers["Result"],
+        'headers': dict(game_state.headers),
+        'moves': game_state.move_list(),
+        'move_data': game_state.move_data(),
+        'bot_think_time': game_state.bot_think_time,
+        'bot_moves': game_state.bot_moves,
+        'finished_at': current_time()
+    }
+
+def write_finished_game(record):
+    save_game(record)
+    record_game_analytics(record)
+    save_stats(record['username'])
+
+# Background decay and size-capped compaction of learned policies
+maintainer = PolicyMaintainer(policies, policy_lock, save_policy).start()
+
+# Hot reload of policy files replaced on disk
+policy_watcher = PolicyFileWatcher(
+    lambda: {username: get_policy_file(username) for username in list(policies)},
+    load_policy,
+    lock=policy_save_lock
+)
+if config.POLICY_STORE['watch_interval']:
+    policy_watcher.start()
+
+# Background learner that applies finished games in batches
+learner = PolicyLearner(
+    apply_learning_record,
+    save_policy,
+    batch_size=config.LEARNER_PARAMS['batch_size'],
+    batch_wait=config.LEARNER_PARAMS['batch_wait']
+).start()
+
+# Background writer for finished games
+finalizer = GameFinalizer(write_finished_game).start()
+
+# Write and apply any queued games before the process exits
+# Runs after the finalizer has drained, so the last saved games are folded into the index
+atexit.register(explorer.merge)
+atexit.register(learner.stop)
+atexit.register(finalizer.stop)
+
+# Start the timer thread
+timer_thread = Thread(target=timer_thread, daemon=True)
+timer_thread.start()
+
 # Initialize data on startup
 initialize_data()
 
@@ -316,6 +563,8 @@ def index():
 def new_game():
     data = request.json
     username = data.get('username', 'Guest')
+    if not valid_username(username):
+        return jsonify({'error': 'Invalid username'}), 400
     player_color = data.get('player_color', 'white')
     time_control = data.get('time_control', '10 min')
     
@@ -323,46 +572,30 @@ def new_game():
     game_id = str(uuid.uuid4())
     
     # Set timers based on time control
-    timers = {'white': 600, 'black': 600}  # Default to 10 minutes
+    seconds = 600  # Default to 10 minutes
     timers_enabled = True
     
-    if time_control == '1 min':
-        timers = {'white': 60, 'black': 60}
-    elif time_control == '3 min':
-        timers = {'white': 180, 'black': 180}
-    elif time_control == '5 min':
-        timers = {'white': 300, 'black': 300}
-    elif time_control == '10 min':
-        timers = {'white': 600, 'black': 600}
-    elif time_control == '30 min':
-        timers = {'white': 1800, 'black': 1800}
+    if time_control in TIME_CONTROL_SECONDS:
+        seconds = TIME_CONTROL_SECONDS[time_control]
     else:  # No limit
         timers_enabled = False
     
     # Initialize game state
-    game_state = {
-        'board': chess.Board(),
-        'game': chess.pgn.Game(),
-        'node': None,
-        'human_color': chess.WHITE if player_color == 'white' else chess.BLACK,
-        'move_history': [],
-        'captured_pieces': [],  # Store captured pieces with move info
-        'username': username,
-        'time_control': time_control,
-        'timers': timers,
-        'timers_enabled': timers_enabled,
-        'last_move_time': current_time(),
-        'game_status': 'active',
-        'bot_loss_streak': 0,
-        'learning_boost_active': False
-    }
+    game_state = GameState(
+        username,
+        chess.WHITE if player_color == 'white' else chess.BLACK,
+        time_control,
+        seconds,
+        timers_enabled,
+        current_time()
+    )
     
     # Set up game headers
-    game_state['game'].headers["Event"] = f"{username} vs Sachin"
-    game_state['game'].headers["Date"] = datetime.now().strftime("%Y.%m.%d")
-    game_state['game'].headers["White"] = username if game_state['human_color'] == chess.WHITE else "Sachin"
-    game_state['game'].headers["Black"] = "Sachin" if game_state['human_color'] == chess.WHITE else username
-    game_state['node'] = game_state['game']
+    game_state.headers["Event"] = f"{username} vs Sachin"
+    game_state.headers["Date"] = datetime.now().strftime("%Y.%m.%d")
+    game_state.headers["White"] = username if game_state.human_color == chess.WHITE else "Sachin"
+    game_state.headers["Black"] = "Sachin" if game_state.human_color == chess.WHITE else username
+    game_state.headers["TimeControl"] = time_control_header(timers_enabled, seconds)
     
     # Store game state
     with games_lock:
@@ -375,9 +608,9 @@ def new_game():
     # Return initial game state
     return jsonify({
         'game_id': game_id,
-        'board': get_board_array(game_state['board']),
-        'current_player': 'white',
-        'timers': game_state['timers'],
+        **board_payload(game_state),
+        'current_player': game_state.current_player(),
+        'timers': game_state.timers_dict(),
         'status': 'active',
         'timers_enabled': timers_enabled
     })
@@ -390,12 +623,12 @@ def make_move():
     to_square = data.get('to')
     promotion = data.get('promotion', 'q')
     
-    with games_lock:
-        if game_id not in games:
-            return jsonify({'error': 'Game not found'}), 404
-        
-        game_state = games[game_id]
-        board = game_state['board']
+    game_state = get_game(game_id)
+    if game_state is None:
+        return jsonify({'error': 'Game not found'}), 404
+    
+    with game_state.lock:
+        board = game_state.hydrate().board
         
         # Check if this is a promotion move
         move = None
@@ -417,186 +650,48 @@ def make_move():
                 return jsonify({'error': 'Invalid move format'}), 400
         
         # Validate move
-        if move not in board.legal_moves:
+        if move not in position_cache.legal_moves(board):
             return jsonify({'error': 'Invalid move'}), 400
         
         # Update timer for current player
-        if game_state['timers_enabled']:
-            current_time_val = current_time()
-            elapsed = current_time_val - game_state['last_move_time']
-            current_player = 'white' if board.turn == chess.WHITE else 'black'
-            game_state['timers'][current_player] = max(0, game_state['timers'][current_player] - elapsed)
-            game_state['last_move_time'] = current_time_val
-            
-            # Check if time has expired
-            if game_state['timers'][current_player] <= 0:
-                # Time's up - current player loses
-                game_state['game_status'] = 'finished'
-                
-                # Determine winner
-                if current_player == 'white':
-                    result = "0-1"  # Black wins
-                    outcome = "Black wins"
-                else:
-                    result = "1-0"  # White wins
-                    outcome = "White wins"
-                
-                # Update game headers
-                game_state['game'].headers["Result"] = result
-                
-                # Update stats
-                username = game_state['username']
-                if username not in stats:
-                    load_stats(username)
-                
-                if outcome == "White wins":
-                    if game_state['human_color'] == chess.WHITE:
-                        stats[username]['wins'] += 1
-                        # Human won, bot lost
-                        game_state['bot_loss_streak'] += 1
-                        if game_state['bot_loss_streak'] >= 5:
-                            game_state['learning_boost_active'] = True
-                    else:
-                        stats[username]['losses'] += 1
-                        # Bot won, reset streak
-                        game_state['bot_loss_streak'] = 0
-                        game_state['learning_boost_active'] = False
-                else:  # Black wins
-                    if game_state['human_color'] == chess.BLACK:
-                        stats[username]['wins'] += 1
-                        # Human won, bot lost
-                        game_state['bot_loss_streak'] += 1
-                        if game_state['bot_loss_streak'] >= 5:
-                            game_state['learning_boost_active'] = True
-                    else:
-                        stats[username]['losses'] += 1
-                        # Bot won, reset streak
-                        game_state['bot_loss_streak'] = 0
-                        game_state['learning_boost_active'] = False
-                
-                stats[username]['games_played'] += 1
-                
-                # Update learning policy only if user is jakhar
-                if username.lower() == "jakhar":
-                    with policy_lock:
-                        update_policy(
-                            username, 
-                            outcome, 
-                            [m['move'] for m in game_state['move_history']], 
-                            game_state['human_color'],
-                            game_state['learning_boost_active']
-                        )
-                
-                # Save game and stats
-                save_game(game_state)
-                save_stats(username)
-                
+        if game_state.timers_enabled:
+            result = charge_clock(game_state)
+            if result:
                 return jsonify({
                     'game_id': game_id,
                     'status': 'finished',
                     'result': result,
-                    'stats': stats[username]
+                    'stats': get_user_stats(game_state.username)
                 })
         
-        # Check for capture
-        captured_piece = None
-        if board.is_capture(move):
-            captured_piece = board.piece_at(move.to_square)
-        
-        # Make the move
-        board.push(move)
-        
-        # Store move with capture information
-        move_info = {
-            'move': move,
-            'captured': captured_piece.symbol() if captured_piece else None,
-            'captured_color': 'white' if captured_piece and captured_piece.color == chess.WHITE else 'black' if captured_piece else None
-        }
-        game_state['move_history'].append(move_info)
-        
-        # Update PGN
-        game_state['node'] = game_state['node'].add_variation(move)
+        # Make the move, appending it, any capture and the mover's clock to the packed move log
+        clock = game_state.timers[board.turn] if game_state.timers_enabled else None
+        game_state.push(move, 'human', clock=clock)
         
         # Check if game is over
-        if board.is_game_over():
+        if position_cache.is_game_over(board):
             result = board.result()
-            game_state['game_status'] = 'finished'
-            
-            # Update stats
-            username = game_state['username']
-            game_state['game'].headers["Result"] = result
-            
-            if result == "1-0":
-                outcome = "White wins"
-                if game_state['human_color'] == chess.WHITE:
-                    stats[username]['wins'] += 1
-                    # Human won, bot lost
-                    game_state['bot_loss_streak'] += 1
-                    if game_state['bot_loss_streak'] >= 5:
-                        game_state['learning_boost_active'] = True
-                else:
-                    stats[username]['losses'] += 1
-                    # Bot won, reset streak
-                    game_state['bot_loss_streak'] = 0
-                    game_state['learning_boost_active'] = False
-            elif result == "0-1":
-                outcome = "Black wins"
-                if game_state['human_color'] == chess.BLACK:
-                    stats[username]['wins'] += 1
-                    # Human won, bot lost
-                    game_state['bot_loss_streak'] += 1
-                    if game_state['bot_loss_streak'] >= 5:
-                        game_state['learning_boost_active'] = True
-                else:
-                    stats[username]['losses'] += 1
-                    # Bot won, reset streak
-                    game_state['bot_loss_streak'] = 0
-                    game_state['learning_boost_active'] = False
-            else:
-                outcome = "Draw"
-                stats[username]['draws'] += 1
-                # Draw, reset streak
-                game_state['bot_loss_streak'] = 0
-                game_state['learning_boost_active'] = False
-            
-            stats[username]['games_played'] += 1
-            
-            # Update learning policy only if user is jakhar
-            if username.lower() == "jakhar":
-                with policy_lock:
-                    update_policy(
-                        username, 
-                        outcome, 
-                        [m['move'] for m in game_state['move_history']], 
-                        game_state['human_color'],
-                        game_state['learning_boost_active']
-                    )
-            
-            # Save game and stats
-            save_game(game_state)
-            save_stats(username)
+            finalize_game(game_state, result)
             
             return jsonify({
                 'game_id': game_id,
-                'board': get_board_array(board),
+                **board_payload(game_state),
                 'move': move.uci(),
-                'current_player': 'white' if board.turn == chess.WHITE else 'black',
+                'current_player': game_state.current_player(),
                 'status': 'finished',
                 'result': result,
-                'captured_pieces': get_captured_pieces(game_state['move_history']),
-                'stats': stats[username],
-                'timers': game_state['timers']
+                'stats': get_user_stats(game_state.username),
+                'timers': game_state.timers_dict()
             })
         
         # Return updated game state
         return jsonify({
             'game_id': game_id,
-            'board': get_board_array(board),
+            **board_payload(game_state),
             'move': move.uci(),
-            'current_player': 'white' if board.turn == chess.WHITE else 'black',
+            'current_player': game_state.current_player(),
             'status': 'active',
-            'captured_pieces': get_captured_pieces(game_state['move_history']),
-            'timers': game_state['timers']
+            'timers': game_state.timers_dict()
         })
 
 @app.route('/api/bot_move', methods=['POST'])
@@ -604,193 +699,69 @@ def bot_move():
     data = request.json
     game_id = data.get('game_id')
     
-    with games_lock:
-        if game_id not in games:
-            return jsonify({'error': 'Game not found'}), 404
-        
-        game_state = games[game_id]
-        board = game_state['board']
-        username = game_state['username']
+    # Bot moves are never rejected, under load they are served on a cheaper path
+    with admission.admit('bot_move', get_request_priority(game_id)) as ticket:
+        return play_bot_move(game_id, ticket.mode)
+
+def play_bot_move(game_id, mode):
+    game_state = get_game(game_id)
+    if game_state is None:
+        return jsonify({'error': 'Game not found'}), 404
+    
+    with game_state.lock:
+        board = game_state.hydrate().board
+        username = game_state.username
         
         # Update timer for current player (human)
-        if game_state['timers_enabled']:
-            current_time_val = current_time()
-            elapsed = current_time_val - game_state['last_move_time']
-            current_player = 'white' if board.turn == chess.WHITE else 'black'
-            game_state['timers'][current_player] = max(0, game_state['timers'][current_player] - elapsed)
-            game_state['last_move_time'] = current_time_val
-            
-            # Check if time has expired
-            if game_state['timers'][current_player] <= 0:
-                # Time's up - current player loses
-                game_state['game_status'] = 'finished'
-                
-                # Determine winner
-                if current_player == 'white':
-                    result = "0-1"  # Black wins
-                    outcome = "Black wins"
-                else:
-                    result = "1-0"  # White wins
-                    outcome = "White wins"
-                
-                # Update game headers
-                game_state['game'].headers["Result"] = result
-                
-                # Update stats
-                if outcome == "White wins":
-                    if game_state['human_color'] == chess.WHITE:
-                        stats[username]['wins'] += 1
-                        # Human won, bot lost
-                        game_state['bot_loss_streak'] += 1
-                        if game_state['bot_loss_streak'] >= 5:
-                            game_state['learning_boost_active'] = True
-                    else:
-                        stats[username]['losses'] += 1
-                        # Bot won, reset streak
-                        game_state['bot_loss_streak'] = 0
-                        game_state['learning_boost_active'] = False
-                else:  # Black wins
-                    if game_state['human_color'] == chess.BLACK:
-                        stats[username]['wins'] += 1
-                        # Human won, bot lost
-                        game_state['bot_loss_streak'] += 1
-                        if game_state['bot_loss_streak'] >= 5:
-                            game_state['learning_boost_active'] = True
-                    else:
-                        stats[username]['losses'] += 1
-                        # Bot won, reset streak
-                        game_state['bot_loss_streak'] = 0
-                        game_state['learning_boost_active'] = False
-                
-                stats[username]['games_played'] += 1
-                
-                # Update learning policy only if user is jakhar
-                if username.lower() == "jakhar":
-                    with policy_lock:
-                        update_policy(
-                            username, 
-                            outcome, 
-                            [m['move'] for m in game_state['move_history']], 
-                            game_state['human_color'],
-                            game_state['learning_boost_active']
-                        )
-                
-                # Save game and stats
-                save_game(game_state)
-                save_stats(username)
-                
+        if game_state.timers_enabled:
+            result = charge_clock(game_state)
+            if result:
                 return jsonify({
                     'game_id': game_id,
                     'status': 'finished',
                     'result': result,
-                    'stats': stats[username]
+                    'stats': get_user_stats(username)
                 })
         
         # Get bot move
-        move = get_bot_move(board, username, [m['move'] for m in game_state['move_history']])
+        think_start = time.perf_counter()
+        move, source = choose_bot_move(board, username, game_state.moves, mode, game_state.time_control)
+        think_time = time.perf_counter() - think_start
+        game_state.bot_think_time += think_time
+        game_state.bot_moves += 1
         
-        # Check for capture
-        captured_piece = None
-        if board.is_capture(move):
-            captured_piece = board.piece_at(move.to_square)
-        
-        # Make the move
-        board.push(move)
-        
-        # Store move with capture information
-        move_info = {
-            'move': move,
-            'captured': captured_piece.symbol() if captured_piece else None,
-            'captured_color': 'white' if captured_piece and captured_piece.color == chess.WHITE else 'black' if captured_piece else None
-        }
-        game_state['move_history'].append(move_info)
-        
-        # Update PGN
-        game_state['node'] = game_state['node'].add_variation(move)
+        # Make the move, appending it, any capture, where it came from and how long it took to the move log
+        clock = game_state.timers[board.turn] if game_state.timers_enabled else None
+        game_state.push(move, source, think_time, clock)
         
         # Update timer for bot move (no time deduction for bot)
-        if game_state['timers_enabled']:
-            game_state['last_move_time'] = current_time()
+        if game_state.timers_enabled:
+            game_state.last_move_time = current_time()
         
         # Check if game is over
-        if board.is_game_over():
+        if position_cache.is_game_over(board):
             result = board.result()
-            game_state['game_status'] = 'finished'
-            
-            # Update stats
-            game_state['game'].headers["Result"] = result
-            
-            if result == "1-0":
-                outcome = "White wins"
-                if game_state['human_color'] == chess.WHITE:
-                    stats[username]['wins'] += 1
-                    # Human won, bot lost
-                    game_state['bot_loss_streak'] += 1
-                    if game_state['bot_loss_streak'] >= 5:
-                        game_state['learning_boost_active'] = True
-                else:
-                    stats[username]['losses'] += 1
-                    # Bot won, reset streak
-                    game_state['bot_loss_streak'] = 0
-                    game_state['learning_boost_active'] = False
-            elif result == "0-1":
-                outcome = "Black wins"
-                if game_state['human_color'] == chess.BLACK:
-                    stats[username]['wins'] += 1
-                    # Human won, bot lost
-                    game_state['bot_loss_streak'] += 1
-                    if game_state['bot_loss_streak'] >= 5:
-                        game_state['learning_boost_active'] = True
-                else:
-                    stats[username]['losses'] += 1
-                    # Bot won, reset streak
-                    game_state['bot_loss_streak'] = 0
-                    game_state['learning_boost_active'] = False
-            else:
-                outcome = "Draw"
-                stats[username]['draws'] += 1
-                # Draw, reset streak
-                game_state['bot_loss_streak'] = 0
-                game_state['learning_boost_active'] = False
-            
-            stats[username]['games_played'] += 1
-            
-            # Update learning policy only if user is jakhar
-            if username.lower() == "jakhar":
-                with policy_lock:
-                    update_policy(
-                        username, 
-                        outcome, 
-                        [m['move'] for m in game_state['move_history']], 
-                        game_state['human_color'],
-                        game_state['learning_boost_active']
-                    )
-            
-            # Save game and stats
-            save_game(game_state)
-            save_stats(username)
+            finalize_game(game_state, result)
             
             return jsonify({
                 'game_id': game_id,
-                'board': get_board_array(board),
+                **board_payload(game_state),
                 'move': move.uci(),
-                'current_player': 'white' if board.turn == chess.WHITE else 'black',
+                'current_player': game_state.current_player(),
                 'status': 'finished',
                 'result': result,
-                'captured_pieces': get_captured_pieces(game_state['move_history']),
-                'stats': stats[username],
-                'timers': game_state['timers']
+                'stats': get_user_stats(username),
+                'timers': game_state.timers_dict()
             })
         
         # Return updated game state
         return jsonify({
             'game_id': game_id,
-            'board': get_board_array(board),
+            **board_payload(game_state),
             'move': move.uci(),
-            'current_player': 'white' if board.turn == chess.WHITE else 'black',
+            'current_player': game_state.current_player(),
             'status': 'active',
-            'captured_pieces': get_captured_pieces(game_state['move_history']),
-            'timers': game_state['timers']
+            'timers': game_state.timers_dict()
         })
 
 @app.route('/api/hint', methods=['POST'])
@@ -798,16 +769,21 @@ def get_hint():
     data = request.json
     game_id = data.get('game_id')
     
-    with games_lock:
-        if game_id not in games:
-            return jsonify({'error': 'Game not found'}), 404
-        
-        game_state = games[game_id]
-        board = game_state['board']
-        username = game_state['username']
+    # Hints are optional, when saturated they are shed with a 503
+    with admission.admit('hint', get_request_priority(game_id)) as ticket:
+        return suggest_hint(game_id, ticket.mode)
+
+def suggest_hint(game_id, mode):
+    game_state = get_game(game_id)
+    if game_state is None:
+        return jsonify({'error': 'Game not found'}), 404
+    
+    with game_state.lock:
+        board = game_state.hydrate().board
+        username = game_state.username
         
         # Get hint move
-        move = get_hint_move(board, username, [m['move'] for m in game_state['move_history']])
+        move = get_hint_move(board, username, game_state.moves, mode)
         
         return jsonify({
             'game_id': game_id,
@@ -816,48 +792,63 @@ def get_hint():
             'to_square': chess.square_name(move.to_square)
         })
 
+def get_request_priority(game_id):
+    # Timed games closest to running out of clock are served first
+    game_state = games.get(game_id)
+    if not game_state or not game_state.timers_enabled or game_state.game_status != 'active':
+        return float('inf')
+    return game_state.timers[game_state.side_to_move()]
+
+@app.errorhandler(Overloaded)
+def handle_overloaded(error):
+    response = jsonify({'error': 'Server busy, please retry', 'route': error.route})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
 @app.route('/api/undo', methods=['POST'])
 def undo_move():
     data = request.json
     game_id = data.get('game_id')
     
-    with games_lock:
-        if game_id not in games:
-            return jsonify({'error': 'Game not found'}), 404
+    # Number of plies to take back, e.g. 2 to undo a move and the bot's reply
+    try:
+        count = int(data.get('count', 1))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid undo count'}), 400
+    
+    game_state = get_game(game_id)
+    if game_state is None:
+        return jsonify({'error': 'Game not found'}), 404
+    
+    with game_state.lock:
+        board = game_state.hydrate().board
         
-        game_state = games[game_id]
-        board = game_state['board']
+        # A finished game has already been counted, saved and learned from
+        if game_state.finalized:
+            return jsonify({'error': 'Game is over'}), 400
         
-        if len(game_state['move_history']) == 0:
+        if game_state.ply_count() == 0:
             return jsonify({'error': 'No moves to undo'}), 400
         
-        # Get the last move info
-        last_move_info = game_state['move_history'].pop()
-        last_move = last_move_info['move']
-        
-        # Undo the move
-        board.pop()
-        
-        # Update PGN (this is simplified - in a real implementation, you'd need to rebuild the PGN)
-        game_state['node'] = game_state['game']
-        for move_info in game_state['move_history']:
-            game_state['node'] = game_state['node'].add_variation(move_info['move'])
+        if count < 1 or count > game_state.ply_count():
+            return jsonify({'error': 'Invalid undo count'}), 400
         
-        # Update game status
-        game_state['game_status'] = 'active'
+        # Undo the moves, the PGN is rebuilt from the move log when it is saved
+        for _ in range(count):
+            game_state.pop()
         
         # Update timer for the player whose turn it is now
-        if game_state['timers_enabled']:
-            game_state['last_move_time'] = current_time()
+        if game_state.timers_enabled:
+            game_state.last_move_time = current_time()
         
         # Return updated game state
         return jsonify({
             'game_id': game_id,
-            'board': get_board_array(board),
-            'current_player': 'white' if board.turn == chess.WHITE else 'black',
+            **board_payload(game_state),
+            'current_player': game_state.current_player(),
             'status': 'active',
-            'captured_pieces': get_captured_pieces(game_state['move_history']),
-            'timers': game_state['timers']
+            'timers': game_state.timers_dict()
         })
 
 @app.route('/api/resign', methods=['POST'])
@@ -865,150 +856,206 @@ def resign():
     data = request.json
     game_id = data.get('game_id')
     
-    with games_lock:
-        if game_id not in games:
-            return jsonify({'error': 'Game not found'}), 404
-        
-        game_state = games[game_id]
-        username = game_state['username']
-        
-        # Set result based on who is resigning
-        if game_state['human_color'] == chess.WHITE:
-            result = "0-1"  # Black wins
-            outcome = "Black wins"
-        else:
-            result = "1-0"  # White wins
-            outcome = "White wins"
-        
-        game_state['game_status'] = 'finished'
-        game_state['game'].headers["Result"] = result
-        
-        # Update stats
-        if game_state['human_color'] == chess.WHITE:
-            stats[username]['losses'] += 1
-        else:
-            stats[username]['wins'] += 1
-        
-        stats[username]['games_played'] += 1
-        
-        # Update learning policy only if user is jakhar
-        if username.lower() == "jakhar":
-            with policy_lock:
-                update_policy(
-                    username, 
-                    outcome, 
-                    [m['move'] for m in game_state['move_history']], 
-                    game_state['human_color'],
-                    game_state['learning_boost_active']
-                )
-        
-        # Save game and stats
-        save_game(game_state)
-        save_stats(username)
+    game_state = get_game(game_id)
+    if game_state is None:
+        return jsonify({'error': 'Game not found'}), 404
+    
+    with game_state.lock:
+        # The human resigns, so the bot's colour wins
+        result = "0-1" if game_state.human_color == chess.WHITE else "1-0"
+        finalize_game(game_state, result)
         
         return jsonify({
             'game_id': game_id,
             'status': 'finished',
-            'result': result,
-            'stats': stats[username]
+            'result': game_state.headers["Result"],
+            'stats': get_user_stats(game_state.username)
         })
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     username = request.args.get('username', 'Guest')
+    if not valid_username(username):
+        return jsonify({'error': 'Invalid username'}), 400
     
     if username not in stats:
         load_stats(username)
     
     return jsonify({
         'username': username,
-        'stats': stats.get(username, {'wins': 0, 'losses': 0, 'draws': 0, 'games_played': 0})
+        'stats': get_user_stats(username)
+    })
+
+@app.route('/api/analytics', methods=['GET'])
+def get_analytics():
+    username = request.args.get('username', 'Guest')
+    if not valid_username(username):
+        return jsonify({'error': 'Invalid username'}), 400
+    
+    return jsonify({
+        'username': username,
+        'analytics': analytics.get(username)
+    })
+
+@app.route('/api/explorer', methods=['GET'])
+def get_explorer():
+    username = request.args.get('username', 'jakhar')
+    fen = request.args.get('fen')
+    moves = request.args.get('moves', '')
+    
+    # Position either as a FEN or as UCI moves from the start, e.g. "e2e4 e7e5"
+    try:
+        if fen:
+            board = chess.Board(fen)
+        else:
+            board = chess.Board()
+            for uci in moves.replace(',', ' ').split():
+                move = chess.Move.from_uci(uci)
+                if move not in board.legal_moves:
+                    return jsonify({'error': f'Illegal move {uci}'}), 400
+                board.push(move)
+    except ValueError:
+        return jsonify({'error': 'Invalid position'}), 400
+    
+    weights = get_policy_weights(board, username)
+    continuations = []
+    for move, (played, white_wins, black_wins, draws) in explorer.lookup(board).items():
+        continuations.append({
+            'move': move.uci(),
+            'san': board.san(move) if board.is_legal(move) else move.uci(),
+            'games': played,
+            'white_wins': white_wins,
+            'black_wins': black_wins,
+            'draws': draws,
+            'policy_weight': weights.get(move.uci(), 0)
+        })
+    continuations.sort(key=lambda c: c['games'], reverse=True)
+    
+    return jsonify({
+        'fen': board.fen(),
+        'continuations': continuations
+    })
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return jsonify({
+        'position_cache': position_cache.stats(),
+        'admission': admission.stats(),
+        'finalizer': finalizer.stats(),
+        'endgame_tables': endgame_tables.stats(),
+        'policies': {username: {'version': store.snapshot().version, 'states': len(store)}
+                     for username, store in list(policies.items())}
+    })
+
+@app.route('/api/admin/reload_policy', methods=['POST'])
+def reload_policy():
+    token = config.POLICY_STORE['admin_token']
+    if token and request.headers.get('X-Admin-Token') != token:
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    username = data.get('username', 'jakhar')
+    if not valid_username(username):
+        return jsonify({'error': 'Invalid username'}), 400
+    
+    # Requests already holding the old snapshot finish on it, new ones see the reloaded table
+    load_policy(username)
+    snapshot = policies[username].snapshot()
+    return jsonify({
+        'username': username,
+        'version': snapshot.version,
+        'states': len(snapshot)
+    })
+
+@app.route('/api/export/games', methods=['GET'])
+def export_games():
+    username = request.args.get('username')
+    export_format = request.args.get('format', 'pgn')
+    result = request.args.get('result')
+    if not username:
+        return jsonify({'error': 'username is required'}), 400
+    if not valid_username(username):
+        return jsonify({'error': 'Invalid username'}), 400
+    if export_format not in ('pgn', 'zip'):
+        return jsonify({'error': 'format must be pgn or zip'}), 400
+    if result and result not in USER_RESULTS + PGN_RESULTS:
+        return jsonify({'error': f"result must be one of {', '.join(USER_RESULTS + PGN_RESULTS)}"}), 400
+    try:
+        since = parse_date(request.args['since']) if request.args.get('since') else None
+        until = parse_date(request.args['until']) if request.args.get('until') else None
+    except ValueError:
+        return jsonify({'error': 'dates must be YYYY-MM-DD'}), 400
+    
+    # Games are read and sent a chunk at a time, no locks are held while streaming
+    matches = game_filter(username, since, until, result)
+    if export_format == 'zip':
+        return Response(zip_stream(matches), mimetype='application/zip',
+                        headers={'Content-Disposition': f'attachment; filename="{username}_games.zip"'})
+    return Response(pgn_stream(matches), mimetype='application/x-chess-pgn',
+                    headers={'Content-Disposition': f'attachment; filename="{username}_games.pgn"'})
+
+@app.route('/api/export/policy', methods=['GET'])
+def export_policy():
+    username = request.args.get('username', 'jakhar')
+    if not valid_username(username):
+        return jsonify({'error': 'Invalid username'}), 400
+    
+    # Only users with a policy of their own, others play from jakhar's
+    if username not in policies:
+        if not os.path.exists(f"{user_dir(username)}/policy.pkl"):
+            return jsonify({'error': 'Policy not found'}), 404
+        load_policy(username)
+    
+    # The snapshot never changes, learning carries on while it is streamed
+    snapshot = policies[username].snapshot()
+    return Response(policy_stream(snapshot), mimetype='application/x-ndjson', headers={
+        'Content-Disposition': f'attachment; filename="{username}_policy.ndjson"',
+        'X-Policy-Version': str(snapshot.version),
+        'X-Policy-States': str(len(snapshot)),
     })
 
 @app.route('/api/timers', methods=['GET'])
 def get_timers():
     game_id = request.args.get('game_id')
     
-    with games_lock:
-        if game_id not in games:
-            return jsonify({'error': 'Game not found'}), 404
-        
-        game_state = games[game_id]
-        
+    game_state = get_game(game_id)
+    if game_state is None:
+        return jsonify({'error': 'Game not found'}), 404
+    
+    with game_state.lock:
         # Update timers based on elapsed time
-        if game_state['timers_enabled'] and game_state['game_status'] == 'active':
-            current_time_val = current_time()
-            elapsed = current_time_val - game_state['last_move_time']
-            current_player = 'white' if game_state['board'].turn == chess.WHITE else 'black'
-            game_state['timers'][current_player] = max(0, game_state['timers'][current_player] - elapsed)
-            game_state['last_move_time'] = current_time_val
-            
-            # Check if time has expired
-            if game_state['timers'][current_player] <= 0:
-                # Time's up - current player loses
-                game_state['game_status'] = 'finished'
-                
-                # Determine winner
-                if current_player == 'white':
-                    result = "0-1"  # Black wins
-                    outcome = "Black wins"
-                else:
-                    result = "1-0"  # White wins
-                    outcome = "White wins"
-                
-                # Update game headers
-                game_state['game'].headers["Result"] = result
-                
-                # Update stats
-                username = game_state['username']
-                if outcome == "White wins":
-                    if game_state['human_color'] == chess.WHITE:
-                        stats[username]['wins'] += 1
-                        # Human won, bot lost
-                        game_state['bot_loss_streak'] += 1
-                        if game_state['bot_loss_streak'] >= 5:
-                            game_state['learning_boost_active'] = True
-                    else:
-                        stats[username]['losses'] += 1
-                        # Bot won, reset streak
-                        game_state['bot_loss_streak'] = 0
-                        game_state['learning_boost_active'] = False
-                else:  # Black wins
-                    if game_state['human_color'] == chess.BLACK:
-                        stats[username]['wins'] += 1
-                        # Human won, bot lost
-                        game_state['bot_loss_streak'] += 1
-                        if game_state['bot_loss_streak'] >= 5:
-                            game_state['learning_boost_active'] = True
-                    else:
-                        stats[username]['losses'] += 1
-                        # Bot won, reset streak
-                        game_state['bot_loss_streak'] = 0
-                        game_state['learning_boost_active'] = False
-                
-                stats[username]['games_played'] += 1
-                
-                # Update learning policy only if user is jakhar
-                if username.lower() == "jakhar":
-                    with policy_lock:
-                        update_policy(
-                            username, 
-                            outcome, 
-                            [m['move'] for m in game_state['move_history']], 
-                            game_state['human_color'],
-                            game_state['learning_boost_active']
-                        )
-                
-                # Save game and stats
-                save_game(game_state)
-                save_stats(username)
+        if game_state.timers_enabled and game_state.game_status == 'active':
+            charge_clock(game_state)
         
         return jsonify({
             'game_id': game_id,
-            'timers': game_state['timers'],
-            'status': game_state['game_status']
+            'timers': game_state.timers_dict(),
+            'status': game_state.game_status
         })
 
+def wants_v2():
+    # Clients opt into the compact v2 format per request
+    if request.args.get('v') == '2' or request.headers.get('X-API-Version') == '2':
+        return True
+    data = request.get_json(silent=True) or {}
+    return str(data.get('api_version', '')) == '2'
+
+def board_payload(game_state):
+    # v1 sends the full board and captured lists, v2 a FEN plus the last move's delta
+    board = game_state.board
+    if wants_v2():
+        last = game_state.last_move()
+        return {
+            'api_version': 2,
+            'fen': board.fen(),
+            'last_move': last.uci() if last else None,
+            'captured': game_state.last_capture()
+        }
+    return {
+        'board': get_board_array(board),
+        'captured_pieces': get_captured_pieces(game_state)
+    }
+
 def get_board_array(board):
     # Convert the chess board to a 2D array representation
     board_array = []
@@ -1026,39 +1073,124 @@ def get_board_array(board):
         board_array.append(row)
     return board_array
 
-def get_captured_pieces(move_history):
-    # Calculate captured pieces from move history
-    captured_white = []
-    captured_black = []
+def get_captured_pieces(game_state):
+    # Captured pieces from the capture codes in the move log
+    return game_state.captured_pieces()
+
+def record_game_analytics(record):
+    analytics.record_game(
+        record['username'],
+        record['human_color'],
+        # Bucketed from the TimeControl header, as the archive backfill does
+        time_control_from_header(record['headers'].get('TimeControl')),
+        record['result'],
+        record['moves'],
+        record['bot_think_time'],
+        record['bot_moves']
+    )
+    analytics.save(record['username'])
+
+def build_pgn_game(record):
+    # Materialise the chess.pgn tree from the headers and move list
+    game = chess.pgn.Game()
+    for name, value in record['headers'].items():
+        game.headers[name] = value
     
-    for move_info in move_history:
-        if move_info['captured']:
-            if move_info['captured_color'] == 'white':
-                captured_white.append(move_info['captured'])
-            else:
-                captured_black.append(move_info['captured'])
+    node = game
+    for move, move_data in zip(record['moves'], record['move_data']):
+        node = node.add_variation(move)
+        node.comment = pgn_move_comment(*move_data)
     
-    return {
-        'white': captured_white,
-        'black': captured_black
-    }
+    return game
 
-def save_game(game_state):
-    # Set result in PGN
-    result = game_state['board'].result() if game_state['game_status'] == 'finished' else '*'
-    game_state['game'].headers["Result"] = result
-    
+def pgn_move_comment(source, think_time, clock):
+    # Clock and elapsed move time as [%clk]/[%emt] commands, plus where the move came from
+    parts = []
+    if clock is not None:
+        parts.append(f"[%clk {format_pgn_time(clock, 1)}]")
+    if think_time is not None:
+        parts.append(f"[%emt {format_pgn_time(think_time, 6)}]")
+    if source is not None and source != 'human':
+        parts.append(f"[%source {source}]")
+    return ' '.join(parts)
+
+def format_pgn_time(seconds, places):
+    # H:MM:SS.f, with microseconds for think times so cached moves don't all read as zero
+    seconds = round(max(0.0, seconds), places)
+    hours, rest = divmod(seconds, 3600)
+    minutes, rest = divmod(rest, 60)
+    return f"{int(hours)}:{int(minutes):02d}:{rest:0{places + 3}.{places}f}"
+
+def save_game(record):
     # Save PGN file
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    username = game_state['username']
-    filename = f"games/{timestamp}_{username}_vs_sachin.pgn"
+    username = record['username']
+    filename = f"games/{timestamp}_{checked_username(username)}_vs_sachin.pgn"
     
     with open(filename, "w") as f:
         exporter = chess.pgn.FileExporter(f)
-        game_state['game'].accept(exporter)
+        build_pgn_game(record).accept(exporter)
+    
+    # Append a packed copy to the binary archive
+    if config.GAME_STORAGE['binary_archive']:
+        append_record(config.GAME_STORAGE['binary_archive'], pack_game(
+            username,
+            record['human_color'],
+            record['result'],
+            0 if not record['timers_enabled'] else TIME_CONTROL_SECONDS.get(record['time_control'], 0),
+            record['finished_at'],
+            record['moves']
+        ))
+    
+    # Keep the opening explorer current
+    explorer.add_game(
+        os.path.basename(filename),
+        record['moves'],
+        record['result']
+    )
     
     # Show confirmation
     print(f"Game saved as {filename}")
 
+# Compressed static assets, keyed by path, encoding and ETag
+compressed_static = {}
+
+@app.after_request
+def compress_response(response):
+    accept = request.headers.get('Accept-Encoding', '')
+    if brotli and 'br' in accept:
+        encoding = 'br'
+    elif 'gzip' in accept:
+        encoding = 'gzip'
+    else:
+        return response
+    
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    
+    # Streamed responses pass through untouched, static files are read and cached
+    is_static = request.endpoint == 'static'
+    if response.is_streamed and not is_static:
+        return response
+    response.direct_passthrough = False
+    data = response.get_data()
+    if len(data) < config.COMPRESSION['min_size']:
+        return response
+    
+    cache_key = (request.path, encoding, response.headers.get('ETag'))
+    compressed = compressed_static.get(cache_key) if is_static else None
+    if compressed is None:
+        if encoding == 'br':
+            compressed = brotli.compress(data, quality=config.COMPRESSION['level'])
+        else:
+            compressed = gzip.compress(data, compresslevel=config.COMPRESSION['level'])
+        if is_static:
+            compressed_static[cache_key] = compressed
+    
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for Sachin's move-selection and learning hot paths.
+
+Every case runs against fixed positions with fixed random seeds, and the
+results are written as JSON together with environment metadata so runs from
+different releases can be compared side by side.
+
+Usage:
+    python benchmarks/bench_engine.py --output bench.json
+    python benchmarks/bench_engine.py --sizes 10000,100000 --repeat 3
+    python benchmarks/bench_engine.py --skip-persistence --search-workers 1,2,4,8 --search-depth 5
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import pickle
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import chess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+SEED = 1234
+BENCH_USER = 'jakhar'
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+# Fixed positions used by the move-selection cases
+POSITIONS = {
+    'opening': 'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3',
+    'middlegame': 'r2q1rk1/pp2bppp/2n1pn2/3p4/3P1B2/2PBPN2/PP1N1PPP/R2QK2R w KQ - 3 10',
+    'endgame': '8/5pk1/6p1/3R4/5P2/6PK/r7/8 w - - 0 40',
+}
+
+
+def environment_metadata():
+    import flask
+
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'chess_version': chess.__version__,
+        'flask_version': getattr(flask, '__version__', None),
+        'seed': SEED,
+    }
+
+
+def max_rss_kb():
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        return None
+
+
+def measure(name, fn, number, repeat, setup=None, params=None):
+    # Time `number` calls per round and keep the best round, then measure
+    # allocations of a single call separately so tracing doesn't skew timings
+    timings = []
+    for _ in range(repeat):
+        random.seed(SEED)
+        if setup:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append(time.perf_counter() - start)
+
+    random.seed(SEED)
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    result = {
+        'name': name,
+        'params': params or {},
+        'number': number,
+        'repeat': repeat,
+        'best_s': best,
+        'mean_s': sum(timings) / len(timings),
+        'ops_per_sec': number / best if best > 0 else None,
+        'peak_alloc_bytes': peak,
+        'max_rss_kb': max_rss_kb(),
+    }
+    print(f"  {name} {params or ''}: {result['ops_per_sec']:.1f} ops/s, peak {peak / 1024:.1f} KiB",
+          file=sys.stderr)
+    return result
+
+
+def random_game(plies, seed):
+    # Seeded random playout, restarting from the initial position when a game ends
+    rng = random.Random(seed)
+    board = chess.Board()
+    moves = []
+    while len(moves) < plies:
+        if board.is_game_over():
+            board = chess.Board()
+        move = rng.choice(list(board.legal_moves))
+        board.push(move)
+        moves.append(move)
+    return moves
+
+
+def long_game(plies, seed):
+    # A single legal game of up to `plies` moves, used for update_policy
+    rng = random.Random(seed)
+    board = chess.Board()
+    moves = []
+    while len(moves) < plies and not board.is_game_over():
+        move = rng.choice(list(board.legal_moves))
+        board.push(move)
+        moves.append(move)
+    return moves
+
+
+def synthetic_policy(size):
+    # FEN-shaped keys with a couple of weighted moves each
+    rng = random.Random(SEED)
+    policy = {}
+    for i in range(size):
+        key = f"rnbqkbnr/pppppppp/8/8/{i:08x}/8/PPPPPPPP/RNBQKBNR w KQkq -"
+        policy[key] = {'e2e4': rng.randint(1, 9), 'd2d4': rng.randint(-3, 9)}
+    return policy
+
+
+def bench_move_selection(app, repeat):
+    from models import GameState
+    from policy_store import PolicyStore
+
+    results = []
+    for phase, fen in POSITIONS.items():
+        board = chess.Board(fen)
+        history = random_game(board.fullmove_number * 2, SEED)
+
+        # Policy miss: empty table, falls through to the heuristic
+        app.policies[BENCH_USER] = PolicyStore(lock=app.policy_lock)
+        results.append(measure('get_bot_move', lambda: app.get_bot_move(board, BENCH_USER, history),
+                               number=200, repeat=repeat, params={'phase': phase, 'policy': 'miss'}))
+
+        # Policy hit: every legal move is weighted in the table
+        key, flipped = app.get_policy_key(board)
+        with app.policies[BENCH_USER].write() as writer:
+            entry = writer.entry(key)
+            for i, move in enumerate(board.legal_moves):
+                entry[app.to_canonical_uci(move, flipped)] = i + 1
+        results.append(measure('get_bot_move', lambda: app.get_bot_move(board, BENCH_USER, history),
+                               number=200, repeat=repeat, params={'phase': phase, 'policy': 'hit'}))
+
+        results.append(measure('get_heuristic_move', lambda: app.get_heuristic_move(board, history),
+                               number=200, repeat=repeat, params={'phase': phase, 'cache': 'warm'}))
+
+        def cold_heuristic():
+            app.position_cache.clear()
+            app.get_heuristic_move(board, history)
+
+        results.append(measure('get_heuristic_move', cold_heuristic,
+                               number=200, repeat=repeat, params={'phase': phase, 'cache': 'cold'}))
+
+        # Per-move loop against one batched evaluation call, with material weights if none are trained
+        legal_moves = tuple(board.legal_moves)
+        evaluator = app.evaluator
+        results.append(measure('score_heuristic_moves', lambda: app.score_heuristic_moves(board, legal_moves),
+                               number=200, repeat=repeat,
+                               params={'phase': phase, 'evaluation': 'trained' if evaluator.available else 'none'}))
+        if evaluator.weights is not None:
+            trained = evaluator.trained
+            evaluator.trained = True
+            try:
+                results.append(measure('score_heuristic_moves', lambda: app.score_heuristic_moves(board, legal_moves),
+                                       number=200, repeat=repeat, params={'phase': phase, 'evaluation': 'batched'}))
+            finally:
+                evaluator.trained = trained
+
+        results.append(measure('get_board_array', lambda: app.get_board_array(board),
+                               number=2000, repeat=repeat, params={'phase': phase}))
+
+    # Captured pieces over a long move log with a capture every few plies
+    for length in (40, 200):
+        game_state = GameState(BENCH_USER, chess.WHITE, '10 min', 600, True, 0)
+        for i in range(length):
+            game_state.moves.append(0)
+            game_state.captures.append(0 if i % 3 else (1 if i % 2 == 0 else -1))
+        results.append(measure('get_captured_pieces', lambda: app.get_captured_pieces(game_state),
+                               number=2000, repeat=repeat, params={'plies': length}))
+
+    return results
+
+
+def bench_learning(app, repeat):
+    from policy_store import PolicyStore
+
+    results = []
+    for plies in (80, 300):
+        moves = long_game(plies, SEED)
+
+        def reset():
+            app.policies[BENCH_USER] = PolicyStore(lock=app.policy_lock)
+
+        results.append(measure(
+            'update_policy',
+            lambda: app.update_policy(BENCH_USER, 'White wins', moves, chess.WHITE),
+            number=20, repeat=repeat, setup=reset, params={'plies': len(moves)}))
+    return results
+
+
+def bench_learner(app, repeat, games=64):
+    from learner import PolicyLearner
+    from policy_store import PolicyStore
+
+    # Distinct seeded games so batches touch a realistic spread of states
+    records = [{
+        'username': BENCH_USER,
+        'outcome': ('White wins', 'Black wins', 'Draw')[i % 3],
+        'moves': long_game(120, SEED + i),
+        'human_color': chess.WHITE if i % 2 == 0 else chess.BLACK,
+        'learning_boost_active': False,
+    } for i in range(games)]
+
+    results = []
+    for batch_size in (1, 8, 32):
+        learner = PolicyLearner(app.apply_learning_record, app.save_policy, batch_size=batch_size)
+
+        def reset():
+            app.policies[BENCH_USER] = PolicyStore(lock=app.policy_lock)
+
+        def run():
+            # Same batching as the worker thread, minus the queue wait
+            for start in range(0, len(records), batch_size):
+                learner.process_batch(records[start:start + batch_size])
+
+        result = measure('learner', run, number=1, repeat=repeat, setup=reset,
+                         params={'games': games, 'batch_size': batch_size})
+        result['games_per_sec'] = games / result['best_s']
+        results.append(result)
+    return results
+
+
+def bench_snapshots(app, live_games, repeat):
+    from threading import RLock
+    from models import GameState
+    from snapshots import GameSnapshotter
+
+    # Synthetic mid-game states built the same way the move routes build them
+    rng = random.Random(SEED)
+    lines = []
+    for i in range(live_games):
+        board = chess.Board()
+        line = []
+        for _ in range(rng.randint(10, 70)):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            move = rng.choice(moves)
+            board.push(move)
+            line.append(move)
+        lines.append(line)
+
+    games = {}
+
+    def build():
+        games.clear()
+        for i, line in enumerate(lines):
+            game_state = GameState(BENCH_USER, chess.WHITE, '10 min', 600, True, time.time())
+            game_state.headers['Event'] = 'bench'
+            for move in line:
+                game_state.push(move)
+            games[str(app.uuid.UUID(int=i + 1))] = game_state
+
+    # Allocation peak of the live games, the board move stacks included
+    results = [measure('game_state_build', build, number=1, repeat=1, params={'live_games': live_games})]
+    results[-1]['bytes_per_game'] = results[-1]['peak_alloc_bytes'] / live_games
+
+    params = dict(app.config.SNAPSHOTS, path=os.path.join('memory', 'snapshots', 'bench.log'))
+    writer = GameSnapshotter(games, RLock(), params)
+
+    results.append(measure('snapshot_write', writer.snapshot, number=1, repeat=1,
+                           setup=lambda: writer.written.clear(), params={'live_games': live_games}))
+    results[-1]['log_bytes'] = os.path.getsize(params['path'])
+
+    # Restart-to-serving time, hydration normally runs afterwards in the background
+    reader = None
+
+    def restore():
+        nonlocal reader
+        reader = GameSnapshotter({}, RLock(), params)
+        reader.restore(hydrate=False)
+
+    results.append(measure('snapshot_restore', restore, number=1, repeat=repeat,
+                           params={'live_games': live_games}))
+
+    def hydrate():
+        restore()
+        reader.hydrate_all(list(reader.games))
+
+    results.append(measure('snapshot_restore_hydrated', hydrate, number=1, repeat=repeat,
+                           params={'live_games': live_games}))
+    return results
+
+
+def bench_search(worker_counts, max_depth, repeat):
+    from search import ParallelSearcher
+
+    # Time to reach each depth, best of `repeat` full searches per worker count
+    results = []
+    baseline = {}
+    for workers in worker_counts:
+        searcher = ParallelSearcher(workers=workers).start()
+        try:
+            for phase, fen in POSITIONS.items():
+                best = None
+                for _ in range(repeat):
+                    result = searcher.search(chess.Board(fen), max_depth)
+                    if best is None or result.elapsed < best.elapsed:
+                        best = result
+                for depth, seconds in enumerate(best.depth_times, start=1):
+                    baseline.setdefault((phase, depth), seconds)
+                    speedup = baseline[(phase, depth)] / seconds if seconds > 0 else None
+                    results.append({
+                        'name': 'search_time_to_depth',
+                        'params': {'phase': phase, 'workers': workers, 'depth': depth},
+                        'repeat': repeat,
+                        'best_s': seconds,
+                        'nodes': best.nodes if depth == best.depth else None,
+                        'speedup': speedup,
+                    })
+                print(f"  search {phase} workers={workers}: depth {best.depth} in {best.elapsed:.2f}s, "
+                      f"{best.nodes} nodes", file=sys.stderr)
+        finally:
+            searcher.stop()
+    return results
+
+
+def bench_persistence(app, sizes, repeat):
+    results = []
+    policy_file = os.path.join('memory', BENCH_USER, 'policy.pkl')
+
+    for size in sizes:
+        table = synthetic_policy(size)
+        with open(policy_file, 'wb') as f:
+            pickle.dump(table, f)
+        file_size = os.path.getsize(policy_file)
+        del table
+        gc.collect()
+
+        # Large tables get fewer rounds so the suite stays usable
+        rounds = repeat if size <= 1_000_000 else 1
+        results.append(measure('load_policy', lambda: app.load_policy(BENCH_USER),
+                               number=1, repeat=rounds,
+                               params={'states': size, 'file_bytes': file_size}))
+        results.append(measure('save_policy', lambda: app.save_policy(BENCH_USER),
+                               number=1, repeat=rounds,
+                               params={'states': size, 'file_bytes': file_size}))
+
+        app.policies.pop(BENCH_USER, None)
+        gc.collect()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='comma-separated policy table sizes for load/save (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5, help='timing rounds per case (default: %(default)s)')
+    parser.add_argument('--live-games', type=int, default=10_000,
+                        help='active games for the snapshot restore case (default: %(default)s)')
+    parser.add_argument('--skip-persistence', action='store_true', help='skip load_policy/save_policy cases')
+    parser.add_argument('--search-workers', default=None,
+                        help='comma-separated worker counts for the search case (default: 1,2,4,.. up to the CPU count)')
+    parser.add_argument('--search-depth', type=int, default=4, help='depth for the search case (default: %(default)s)')
+    parser.add_argument('--skip-search', action='store_true', help='skip the parallel search case')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    output = os.path.abspath(args.output) if args.output else None
+
+    # The app creates its data directories and loads policies on import, so run
+    # everything inside a scratch directory to keep the real memory/ untouched
+    workdir = tempfile.mkdtemp(prefix='sachin_bench_')
+    os.chdir(workdir)
+    os.makedirs(os.path.join('memory', BENCH_USER), exist_ok=True)
+
+    # The app logs to stdout, keep that away from the JSON report
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            report = run_suite(args, sizes)
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    payload = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(payload)
+        print(f"✅ Benchmark results written to {output}", file=sys.stderr)
+    else:
+        print(payload)
+
+
+def search_worker_counts(spec):
+    if spec:
+        return [int(w) for w in spec.split(',') if w]
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    if counts[-1] != (os.cpu_count() or 1):
+        counts.append(os.cpu_count())
+    return counts
+
+
+def run_suite(args, sizes):
+    import app
+
+    report = {
+        'suite': 'engine',
+        'environment': environment_metadata(),
+        'results': [],
+    }
+
+    print("⏱️  Move selection", file=sys.stderr)
+    report['results'] += bench_move_selection(app, args.repeat)
+    print("⏱️  Learning", file=sys.stderr)
+    report['results'] += bench_learning(app, args.repeat)
+    report['results'] += bench_learner(app, args.repeat)
+    print("⏱️  Snapshots", file=sys.stderr)
+    report['results'] += bench_snapshots(app, args.live_games, args.repeat)
+    if not args.skip_search:
+        print("⏱️  Parallel search", file=sys.stderr)
+        report['results'] += bench_search(search_worker_counts(args.search_workers), args.search_depth, args.repeat)
+    if not args.skip_persistence:
+        print("⏱️  Policy persistence", file=sys.stderr)
+        report['results'] += bench_persistence(app, sizes, args.repeat)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Deterministic replay of archived games through Sachin's move selection.
+
+Every position the bot faced in the saved PGNs is rebuilt and choose_bot_move
+is asked again, with a per-position random seed and a chosen policy file, so
+two runs over the same archive see identical positions and identical dice.
+Files are streamed one game at a time and spread over worker processes.
+
+Each run records per-position latency, how often the policy answered, and
+how often the bot picked the move it originally played. A run can be gated
+against a baseline: either a saved report from another build, or the same
+positions replayed with another policy file. The script exits with status 1
+when latency, policy hit rate or agreement regress past config.REPLAY_PARAMS.
+
+Usage:
+    python benchmarks/replay.py --output replay.json
+    python benchmarks/replay.py games games_github --policy memory/jakhar/policy.pkl --baseline replay.json
+    python benchmarks/replay.py --policy new_policy.pkl --baseline-policy memory/jakhar/policy.pkl
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import math
+import os
+import pickle
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import chess
+import chess.pgn
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import config  # noqa: E402
+from analytics import time_control_from_header  # noqa: E402
+from canonical import is_canonical, migrate_policy  # noqa: E402
+
+# Per-process replay state, set up by init_worker
+_app = None
+_username = None
+_seed = None
+
+
+def load_policy_table(policy_file):
+    # Same folding as app.load_policy, without touching the app's own files
+    if not policy_file:
+        return {}
+    with open(policy_file, 'rb') as f:
+        policy_dict = pickle.load(f)
+    return policy_dict if is_canonical(policy_dict) else migrate_policy(policy_dict)
+
+
+def init_worker(root, policy_file, username, seed, search_time_limit):
+    global _app, _username, _seed
+    # Tables and evaluation weights are read from where the replay was started
+    config.ENDGAME_TABLES['directory'] = os.path.join(root, config.ENDGAME_TABLES['directory'])
+    config.EVAL_PARAMS['weights_file'] = os.path.join(root, config.EVAL_PARAMS['weights_file'])
+    # Searches run in-process, and without a time limit they are deterministic too
+    config.SEARCH_PARAMS['workers'] = 1
+    config.SEARCH_PARAMS['time_limit'] = search_time_limit
+    config.POLICY_STORE['watch_interval'] = None
+
+    with contextlib.redirect_stdout(sys.stderr):
+        import app
+        from policy_store import PolicyStore
+        app.policies[username] = PolicyStore(load_policy_table(policy_file), lock=app.policy_lock)
+
+    _app = app
+    _username = username
+    _seed = seed
+
+
+def bot_color(game):
+    return chess.WHITE if game.headers.get('White', '').lower() == 'sachin' else chess.BLACK
+
+
+def replay_file(path):
+    # [(played uci, replayed uci, source, latency)] and a digest of the positions, for one file
+    name = os.path.basename(path)
+    records = []
+    digest = hashlib.sha256()
+    with open(path, 'r') as f:
+        game_index = 0
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            color = bot_color(game)
+            time_control = time_control_from_header(game.headers.get('TimeControl'))
+            board = game.board()
+            history = []
+            for ply, played in enumerate(game.mainline_moves()):
+                if board.turn == color:
+                    digest.update(board.fen().encode())
+                    random.seed(f"{_seed}:{name}:{game_index}:{ply}")
+                    start = time.perf_counter()
+                    move, source = _app.choose_bot_move(board.copy(), _username, history,
+                                                        time_control=time_control)
+                    latency = time.perf_counter() - start
+                    records.append((played.uci(), move.uci(), source, latency))
+                board.push(played)
+                history.append(played)
+            game_index += 1
+    return records, digest.hexdigest()
+
+
+def archive_files(directories):
+    # Each file name once, the first directory that has it wins
+    files = {}
+    for directory in directories:
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith('.pgn') and filename not in files:
+                files[filename] = os.path.abspath(os.path.join(directory, filename))
+    return [files[filename] for filename in sorted(files)]
+
+
+def percentile(values, p):
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)] if values else None
+
+
+def summarize(records):
+    latencies = sorted(record[3] for record in records)
+    positions = len(records)
+    sources = {}
+    for record in records:
+        sources[record[2]] = sources.get(record[2], 0) + 1
+    return {
+        'positions': positions,
+        'policy_hit_rate': sources.get('policy', 0) / positions if positions else 0.0,
+        'agreement': sum(1 for record in records if record[0] == record[1]) / positions if positions else 0.0,
+        'sources': sources,
+        'latency_ms': {
+            'mean': sum(latencies) / positions * 1000 if positions else None,
+            'p50': percentile(latencies, 50) * 1000 if positions else None,
+            'p90': percentile(latencies, 90) * 1000 if positions else None,
+            'p99': percentile(latencies, 99) * 1000 if positions else None,
+            'max': latencies[-1] * 1000 if positions else None,
+        },
+    }
+
+
+def run_replay(files, policy_file, username, seed, workers, search_time_limit):
+    # The app creates its data directories on import, so workers run inside a scratch directory
+    workdir = tempfile.mkdtemp(prefix='sachin_replay_')
+    os.makedirs(os.path.join(workdir, 'memory', username), exist_ok=True)
+    policy_file = os.path.abspath(policy_file) if policy_file else None
+    policy_states = len(load_policy_table(policy_file))
+    cwd = os.getcwd()
+    initargs = (cwd, policy_file, username, seed, search_time_limit)
+    os.chdir(workdir)
+    try:
+        if workers <= 1:
+            init_worker(*initargs)
+            results = [replay_file(path) for path in files]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=initargs) as pool:
+                results = list(pool.map(replay_file, files))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    records = [record for file_records, _ in results for record in file_records]
+    digest = hashlib.sha256(''.join(file_digest for _, file_digest in results).encode()).hexdigest()
+    return {
+        'suite': 'replay',
+        'policy_file': policy_file,
+        'policy_states': policy_states,
+        'username': username,
+        'seed': seed,
+        'files': len(files),
+        'positions_digest': digest,
+        'summary': summarize(records),
+        'moves': [record[1] for record in records],
+    }
+
+
+def compare(baseline, report, params):
+    # Failed gate checks, and how often both runs chose the same move
+    failures = []
+    if baseline['positions_digest'] != report['positions_digest']:
+        return ['positions differ from the baseline, replay the same archive'], None
+
+    old = baseline['summary']
+    new = report['summary']
+    for metric in ('policy_hit_rate', 'agreement'):
+        drop = old[metric] - new[metric]
+        if drop > params[f'max_{metric}_drop']:
+            failures.append(f"{metric} dropped {old[metric]:.3f} -> {new[metric]:.3f}")
+    for metric in ('p50', 'p99'):
+        before = old['latency_ms'][metric]
+        after = new['latency_ms'][metric]
+        # Sub-millisecond moves jitter by more than the ratio, so small absolute rises are ignored
+        if before and after > before * (1 + params['max_latency_regression']) and \
+                after - before > params['min_latency_regression_ms']:
+            failures.append(f"{metric} latency rose {before:.3f} -> {after:.3f} ms")
+
+    same = sum(1 for a, b in zip(baseline['moves'], report['moves']) if a == b)
+    return failures, same / len(report['moves']) if report['moves'] else 1.0
+
+
+def print_summary(label, report):
+    summary = report['summary']
+    latency = summary['latency_ms']
+    print(f"{label}: {summary['positions']} positions in {report['files']} files, "
+          f"policy hits {summary['policy_hit_rate']:.1%}, agreement {summary['agreement']:.1%}", file=sys.stderr)
+    if summary['positions']:
+        print(f"  latency ms: mean {latency['mean']:.3f}, p50 {latency['p50']:.3f}, "
+              f"p90 {latency['p90']:.3f}, p99 {latency['p99']:.3f}, max {latency['max']:.3f}", file=sys.stderr)
+        print(f"  sources: {summary['sources']}", file=sys.stderr)
+
+
+def main():
+    params = config.REPLAY_PARAMS
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directories', nargs='*', default=[config.GAMES_DIR], help='directories of PGN files')
+    parser.add_argument('--policy', default=os.path.join(config.MEMORY_DIR, 'jakhar', 'policy.pkl'),
+                        help='policy file to replay against (default: %(default)s)')
+    parser.add_argument('--username', default='jakhar')
+    parser.add_argument('--seed', type=int, default=params['seed'])
+    parser.add_argument('--workers', type=int, default=params['workers'] or os.cpu_count() or 1)
+    parser.add_argument('--search-time-limit', type=float, default=None,
+                        help='seconds per searched move (default: none, depth-limited and deterministic)')
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--baseline', help='saved report from another build to gate against')
+    parser.add_argument('--baseline-policy', help='replay the same positions with this policy and gate against it')
+    args = parser.parse_args()
+
+    for policy_file in (args.policy, args.baseline_policy):
+        if policy_file and not os.path.exists(policy_file):
+            parser.error(f"policy file not found: {policy_file}")
+
+    files = archive_files(args.directories)
+    report = run_replay(files, args.policy, args.username, args.seed, args.workers, args.search_time_limit)
+    print_summary('Replay', report)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    elif args.baseline_policy:
+        baseline = run_replay(files, args.baseline_policy, args.username, args.seed, args.workers,
+                              args.search_time_limit)
+
+    if baseline is not None:
+        print_summary('Baseline', baseline)
+        failures, same_moves = compare(baseline, report, params)
+        report['gate'] = {'failures': failures, 'same_moves': same_moves}
+        if same_moves is not None:
+            print(f"  same move as the baseline: {same_moves:.1%}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Replay report written to {args.output}", file=sys.stderr)
+
+    if baseline is not None:
+        if report['gate']['failures']:
+            for failure in report['gate']['failures']:
+                print(f"❌ {failure}", file=sys.stderr)
+            sys.exit(1)
+        print("✅ No regression against the baseline", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
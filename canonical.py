@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Canonical policy keys for Sachin.
+
+Positions are folded so that colour-mirrored positions share one policy
+entry: whenever Black is to move the board is mirrored (ranks flipped,
+colours swapped) so every key is from White's point of view, and en-passant
+squares are only kept when a legal en-passant capture exists. Moves are
+stored in the same mirrored frame and translated back on lookup.
+
+Migrate an existing policy file written with raw FEN keys:
+
+    python canonical.py memory/jakhar/policy.pkl
+"""
+
+import argparse
+import os
+import pickle
+import shutil
+
+import chess
+
+
+def canonical_board(board):
+    # (board seen from the side to move as White, whether it was mirrored)
+    if board.turn == chess.BLACK:
+        return board.mirror(), True
+    return board, False
+
+
+def policy_key(board):
+    canonical, flipped = canonical_board(board)
+    return ' '.join(canonical.fen(en_passant='legal').split()[:4]), flipped
+
+
+def mirror_move(move):
+    return chess.Move(chess.square_mirror(move.from_square),
+                      chess.square_mirror(move.to_square),
+                      move.promotion)
+
+
+def to_canonical_uci(move, flipped):
+    return mirror_move(move).uci() if flipped else move.uci()
+
+
+def from_canonical_uci(uci, flipped):
+    move = chess.Move.from_uci(uci)
+    return mirror_move(move) if flipped else move
+
+
+def is_canonical(policy_dict):
+    # Canonical tables only ever have White to move
+    return all(key.split(' ')[1] == 'w' for key in policy_dict)
+
+
+def migrate_policy(policy_dict):
+    # Fold a raw-FEN keyed table into canonical keys, summing merged weights
+    migrated = {}
+    for fen, moves in policy_dict.items():
+        board = chess.Board(f"{fen} 0 1")
+        key, flipped = policy_key(board)
+        entry = migrated.setdefault(key, {})
+        for uci, weight in moves.items():
+            move_uci = to_canonical_uci(chess.Move.from_uci(uci), flipped)
+            entry[move_uci] = entry.get(move_uci, 0) + weight
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate policy.pkl files to canonical keys')
+    parser.add_argument('policy_files', nargs='+', help='policy.pkl files to migrate in place')
+    args = parser.parse_args()
+
+    for policy_file in args.policy_files:
+        with open(policy_file, 'rb') as f:
+            policy_dict = pickle.load(f)
+
+        if is_canonical(policy_dict):
+            print(f"✅ {policy_file} is already canonical ({len(policy_dict)} states)")
+            continue
+
+        migrated = migrate_policy(policy_dict)
+        shutil.copy2(policy_file, f"{policy_file}.bak")
+        tmp_file = f"{policy_file}.tmp"
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(migrated, f)
+        os.replace(tmp_file, policy_file)
+        print(f"🔄 Migrated {policy_file}: {len(policy_dict)} -> {len(migrated)} states "
+              f"(backup at {policy_file}.bak)")
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,8 @@ DEBUG = True
 GAMES_DIR = 'games'
 MEMORY_DIR = 'memory'
 GITHUB_GAMES_DIR = 'games_github'
+# Usernames name directories under memory/ and game files, so nothing else is accepted
+USERNAME_PATTERN = r'[A-Za-z0-9_-]{1,32}'
 
 # Learning parameters
 LEARNING_PARAMS = {
@@ -27,4 +29,123 @@ TIME_CONTROLS = [
     '10 min',
     '30 min',
     'No limit'
-]
\ No newline at end of file
+]
+
+# Background learner: finished games are applied to the policy in batches
+LEARNER_PARAMS = {
+    'batch_size': 16,   # max games applied per pass
+    'batch_wait': 0.5,  # seconds to wait for more games before applying a batch
+}
+
+# Per-user analytics
+ANALYTICS_PARAMS = {
+    'opening_plies': 6,  # track results for opening prefixes up to this many plies
+}
+
+# Opening explorer index, rebuilt with `python explorer.py --build`
+EXPLORER_PARAMS = {
+    'index_file': 'memory/explorer.idx',
+    'overlay_max_positions': 20000,  # fold newly saved games into the index file past this size
+}
+
+# Policy aging and compaction (decay uses LEARNING_PARAMS decay_factor/window_size)
+POLICY_MAINTENANCE = {
+    'max_states': 500000,  # evict cold, low-value states above this size
+    'chunk_size': 2000,    # states processed per maintenance step
+    'interval': 1.0,       # seconds between steps
+    'min_weight': 0.01,    # decayed move weights below this are dropped
+    'hot_games': 20,       # states seen within this many games are never evicted
+}
+
+# Versioned policy tables read without locks, hot-reloaded when the file changes on disk
+POLICY_STORE = {
+    'max_delta': 65536,      # replaced states kept beside the shared base before folding
+    'watch_interval': 2.0,   # seconds between policy file checks, None to disable the watcher
+    'admin_token': None,     # required in X-Admin-Token for /api/admin/* when set
+}
+
+# Shared cache of legal moves, terminal status and heuristic scores per position
+POSITION_CACHE = {
+    'max_entries': 10000,
+}
+
+# Game storage and wire format
+GAME_STORAGE = {
+    'binary_archive': 'games/archive.sgr',  # packed records appended by save_game, None to disable
+}
+
+COMPRESSION = {
+    'min_size': 500,  # responses smaller than this many bytes are sent uncompressed
+    'level': 6,
+}
+
+# Parallel alpha-beta search, used for bot moves in long time controls on a policy miss
+SEARCH_PARAMS = {
+    'workers': 2,            # search processes forked at startup, capped at the CPU count; 1 searches in-process
+    'max_concurrent': 4,     # searches that can share the pool at once
+    'max_depth': 4,
+    'time_limit': 3.0,       # seconds per move, checked between and within depths
+    'time_controls': ['10 min', '30 min', 'No limit'],
+}
+
+# Piece-square evaluation fitted by `python evaluation.py --train`
+EVAL_PARAMS = {
+    'weights_file': 'memory/eval_weights.npz',  # the heuristic only switches to it once this exists
+    'skip_plies': 6,          # opening positions say little about the result
+    'epochs': 300,
+    'learning_rate': 2000.0,  # gradient steps are in centipawns
+    'l2': 0.0001,             # pull towards plain material values, the archive is small
+}
+
+# Endgame tables built by `python tablebase.py --generate`, probed before the policy
+ENDGAME_TABLES = {
+    'directory': 'memory/tablebases',
+    # Stronger side first, at most 4 pieces; 3-piece tables take about a minute each to build,
+    # 4-piece ones are 64 times larger
+    'signatures': ['KQvK', 'KRvK', 'KPvK'],
+}
+
+# Regression gate for `python benchmarks/replay.py`
+REPLAY_PARAMS = {
+    'seed': 1234,
+    'workers': None,                  # replay processes, None for the CPU count
+    'max_latency_regression': 0.25,   # allowed relative rise in p50/p99 move latency
+    'min_latency_regression_ms': 1.0, # rises smaller than this are noise
+    'max_policy_hit_rate_drop': 0.02,
+    'max_agreement_drop': 0.02,       # agreement with the moves originally played
+}
+
+# Streaming /api/export/games and /api/export/policy responses
+EXPORT_PARAMS = {
+    'chunk_size': 64 * 1024,  # bytes gathered before each chunk is sent
+}
+
+# Incremental publishing of games to games_github (prepare_github_games.py)
+PUBLISH_PARAMS = {
+    'manifest': 'games_github/manifest.json',
+    'bundle': 'games_github/bundle/all_games.pgn',  # kept out of games_github itself so it isn't indexed twice
+    'summary': 'games_github/summary.json',
+    'link': True,      # hardlink published files, falls back to copying across filesystems
+    'workers': None,   # worker processes, None for the CPU count
+}
+
+# Snapshots of in-progress games, restored on startup
+SNAPSHOTS = {
+    'path': 'memory/snapshots/games.log',
+    'interval': 2.0,        # seconds between snapshot passes
+    'compact_ratio': 4,     # rewrite the log once it is this many times the live size
+    'clock_policy': 'pause',  # 'pause': downtime isn't charged, 'charge': it is
+}
+
+# Admission control for bot moves and hints
+ADMISSION = {
+    'routes': {
+        # Bot moves are critical: never rejected, served on the cheapest path when the queue is full
+        'bot_move': {'max_active': 4, 'max_queue': 64, 'critical': True, 'max_wait': None},
+        # Hints are optional: shed with 503 when the queue is full or after max_wait seconds
+        'hint': {'max_active': 2, 'max_queue': 16, 'critical': False, 'max_wait': 2.0},
+    },
+    'degrade_policy_at': 0.5,     # queue fill ratio at which moves drop to policy-only
+    'degrade_heuristic_at': 0.8,  # queue fill ratio at which moves drop to heuristic-only
+    'retry_after': 1,             # seconds, sent with 503 responses
+}
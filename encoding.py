@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Compact encodings for Sachin's games.
+
+Moves pack into 16 bits (from square, to square, promotion piece) and a
+finished game packs into a small binary record: a fixed header, the
+username and the move list. Records are appended to a single archive file,
+each prefixed with its length.
+
+Pack an existing PGN archive:
+
+    python encoding.py --pack games --output games/archive.sgr
+"""
+
+import argparse
+import os
+import struct
+from array import array
+from datetime import datetime
+
+import chess
+import chess.pgn
+
+import config
+
+RECORD_MAGIC = b'SCGR'
+RECORD_VERSION = 1
+# magic, version, result, human colour, timestamp, time control seconds (0 = no limit)
+RECORD_HEADER = struct.Struct('<4sBBBxIH')
+LENGTH = struct.Struct('<I')
+
+RESULT_CODES = {'*': 0, '1-0': 1, '0-1': 2, '1/2-1/2': 3}
+RESULTS = {code: result for result, code in RESULT_CODES.items()}
+
+
+def encode_move(move):
+    promotion = move.promotion or 0
+    return move.from_square | (move.to_square << 6) | (promotion << 12)
+
+
+def decode_move(code):
+    promotion = code >> 12
+    return chess.Move(code & 0x3f, (code >> 6) & 0x3f, promotion or None)
+
+
+def pack_moves(moves):
+    packed = array('H', (encode_move(move) for move in moves))
+    if packed.itemsize != 2:
+        raise RuntimeError('unsigned short is not 16 bits on this platform')
+    return packed
+
+
+def pack_game(username, human_color, result, time_control_seconds, timestamp, moves):
+    name = username.encode('utf-8')[:255]
+    packed = pack_moves(moves)
+    return b''.join([
+        RECORD_HEADER.pack(RECORD_MAGIC, RECORD_VERSION, RESULT_CODES.get(result, 0),
+                           1 if human_color == chess.WHITE else 0,
+                           int(timestamp), int(time_control_seconds)),
+        bytes([len(name)]),
+        name,
+        struct.pack('<H', len(packed)),
+        packed.tobytes(),
+    ])
+
+
+def unpack_game(data):
+    magic, version, result, human_color, timestamp, time_control_seconds = RECORD_HEADER.unpack_from(data, 0)
+    if magic != RECORD_MAGIC or version != RECORD_VERSION:
+        raise ValueError('not a Sachin game record')
+
+    offset = RECORD_HEADER.size
+    name_length = data[offset]
+    offset += 1
+    username = data[offset:offset + name_length].decode('utf-8')
+    offset += name_length
+    (count,) = struct.unpack_from('<H', data, offset)
+    offset += 2
+    packed = array('H')
+    packed.frombytes(data[offset:offset + count * 2])
+
+    return {
+        'username': username,
+        'human_color': chess.WHITE if human_color else chess.BLACK,
+        'result': RESULTS.get(result, '*'),
+        'timestamp': timestamp,
+        'time_control_seconds': time_control_seconds,
+        'moves': [decode_move(code) for code in packed],
+    }
+
+
+def append_record(path, record):
+    with open(path, 'ab') as f:
+        f.write(LENGTH.pack(len(record)) + record)
+
+
+def iter_records(path):
+    with open(path, 'rb') as f:
+        while True:
+            prefix = f.read(LENGTH.size)
+            if len(prefix) < LENGTH.size:
+                return
+            (length,) = LENGTH.unpack(prefix)
+            yield unpack_game(f.read(length))
+
+
+def pack_pgn_game(game, timestamp=0):
+    # Binary record for an archived PGN game, None if Sachin isn't one of the players
+    headers = game.headers
+    if headers.get('White') == 'Sachin':
+        username, human_color = headers.get('Black', '?'), chess.BLACK
+    elif headers.get('Black') == 'Sachin':
+        username, human_color = headers.get('White', '?'), chess.WHITE
+    else:
+        return None
+
+    time_control = headers.get('TimeControl', '-')
+    try:
+        seconds = int(time_control.split('+')[0])
+    except ValueError:
+        seconds = 0
+
+    return pack_game(username, human_color, headers.get('Result', '*'), seconds,
+                     timestamp, list(game.mainline_moves()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack PGN games into a binary archive')
+    parser.add_argument('--pack', metavar='DIR', help='directory of PGN files to pack')
+    parser.add_argument('--output', default=config.GAME_STORAGE['binary_archive'])
+    args = parser.parse_args()
+
+    if not args.pack:
+        parser.print_help()
+        return
+
+    pgn_bytes = 0
+    packed = 0
+    tmp_file = f"{args.output}.tmp"
+    with open(tmp_file, 'wb') as out:
+        for filename in sorted(os.listdir(args.pack)):
+            if not filename.endswith('.pgn'):
+                continue
+            path = os.path.join(args.pack, filename)
+            pgn_bytes += os.path.getsize(path)
+            # Filenames start with the save time, e.g. 20250904_230940_...
+            try:
+                timestamp = datetime.strptime(filename[:15], '%Y%m%d_%H%M%S').timestamp()
+            except ValueError:
+                timestamp = os.path.getmtime(path)
+            with open(path, 'r') as f:
+                while True:
+                    game = chess.pgn.read_game(f)
+                    if game is None:
+                        break
+                    record = pack_pgn_game(game, timestamp)
+                    if record:
+                        out.write(LENGTH.pack(len(record)) + record)
+                        packed += 1
+    os.replace(tmp_file, args.output)
+
+    print(f"✅ Packed {packed} games: {pgn_bytes} bytes of PGN -> {os.path.getsize(args.output)} bytes")
+
+
+if __name__ == '__main__':
+    main()
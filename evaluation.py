@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Vectorised piece-square evaluation for Sachin.
+
+A position is twelve piece planes of 64 squares (one per colour and piece
+type) unpacked from the board's bitboards into a NumPy array, and its score
+is the dot product of those 768 features with a weight table. A move only
+changes a handful of features, so all children of a position are scored in
+one batched gather over the weight table: piece off its origin square, onto
+its destination (or promoted), minus any captured piece, plus the rook for
+castling and the pawn taken en passant.
+
+The weights start from plain material values and are fitted offline by
+logistic regression of game results on the positions in games/, or in the
+packed binary archive, which is read without any PGN parsing:
+
+    python evaluation.py --train
+    python evaluation.py --train --archive games/archive.sgr
+
+NumPy is optional: without it, or without trained weights, the heuristic
+move scoring is used unchanged.
+"""
+
+import argparse
+import math
+import os
+
+import chess
+import chess.pgn
+
+import config
+from encoding import iter_records
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PIECE_VALUES = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 320,
+    chess.BISHOP: 330,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 0
+}
+PLANES = 12
+EMPTY = PLANES  # extra all-zero weight row for empty squares
+# Logistic scale: a 400 centipawn lead is 10:1 odds
+RESULT_SCALE = math.log(10) / 400
+
+
+def plane_index(color, piece_type):
+    return (0 if color == chess.WHITE else 6) + piece_type - 1
+
+
+def piece_planes(board):
+    # (12, 64) array of 0/1, square 0 is a1
+    masks = np.array([board.pieces_mask(piece_type, color)
+                      for color in (chess.WHITE, chess.BLACK)
+                      for piece_type in chess.PIECE_TYPES], dtype='<u8')
+    return np.unpackbits(masks.view(np.uint8).reshape(PLANES, 8), axis=1, bitorder='little')
+
+
+def material_weights():
+    weights = np.zeros((PLANES + 1, 64))
+    for piece_type, value in PIECE_VALUES.items():
+        weights[plane_index(chess.WHITE, piece_type)] = value
+        weights[plane_index(chess.BLACK, piece_type)] = -value
+    return weights
+
+
+class Evaluator:
+    def __init__(self, weights_file=config.EVAL_PARAMS['weights_file']):
+        self.weights_file = weights_file
+        self.weights = None
+        self.trained = False
+
+    @property
+    def available(self):
+        return self.trained and self.weights is not None
+
+    def load(self):
+        if np is None:
+            return self
+        self.weights = material_weights()
+        try:
+            saved = np.load(self.weights_file)
+            self.weights[:PLANES] = saved['weights'].reshape(PLANES, 64)
+            self.trained = True
+            print(f"🧮 Loaded evaluation weights from {self.weights_file}")
+        except FileNotFoundError:
+            self.trained = False
+        return self
+
+    def evaluate(self, board):
+        # Centipawns from White's point of view
+        return float(np.sum(piece_planes(board) * self.weights[:PLANES]))
+
+    def score_moves(self, board, moves):
+        # Centipawn score of every child position, from the mover's point of view
+        planes = piece_planes(board)
+        mailbox = np.full(64, EMPTY, dtype=np.intp)
+        plane, square = np.nonzero(planes)
+        mailbox[square] = plane
+        base = float(np.sum(planes * self.weights[:PLANES]))
+
+        count = len(moves)
+        from_sq = np.fromiter((m.from_square for m in moves), dtype=np.intp, count=count)
+        to_sq = np.fromiter((m.to_square for m in moves), dtype=np.intp, count=count)
+        promotion = np.fromiter((m.promotion or 0 for m in moves), dtype=np.intp, count=count)
+
+        own = 0 if board.turn == chess.WHITE else 6
+        enemy = 6 - own
+        weights = self.weights
+        mover = mailbox[from_sq]
+        captured = mailbox[to_sq]
+        placed = np.where(promotion > 0, own + promotion - 1, mover)
+
+        delta = weights[placed, to_sq] - weights[mover, from_sq] - weights[captured, to_sq]
+
+        # En passant: a pawn moving diagonally onto an empty square
+        pawn = own + chess.PAWN - 1
+        en_passant = (mover == pawn) & (captured == EMPTY) & ((from_sq - to_sq) % 8 != 0)
+        ep_square = np.where(board.turn == chess.WHITE, to_sq - 8, to_sq + 8)
+        delta -= np.where(en_passant, weights[enemy + chess.PAWN - 1, ep_square % 64], 0.0)
+
+        # Castling: the king moves two files and the rook jumps over it
+        king = own + chess.KING - 1
+        rook = own + chess.ROOK - 1
+        castling = (mover == king) & (np.abs(to_sq - from_sq) == 2)
+        kingside = to_sq > from_sq
+        rook_from = np.where(kingside, from_sq + 3, from_sq - 4) % 64
+        rook_to = np.where(kingside, from_sq + 1, from_sq - 1) % 64
+        delta += np.where(castling, weights[rook, rook_to] - weights[rook, rook_from], 0.0)
+
+        scores = base + delta
+        return scores if board.turn == chess.WHITE else -scores
+
+
+def iter_pgn_games(games_dir):
+    # (result, starting board, moves) of every game in the PGN files
+    for filename in sorted(os.listdir(games_dir)):
+        if not filename.endswith('.pgn'):
+            continue
+        with open(os.path.join(games_dir, filename), 'r') as f:
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                yield game.headers.get('Result', '*'), game.board(), game.mainline_moves()
+
+
+def iter_archive_games(archive):
+    # Same from the packed records, Sachin's games always start from the initial position
+    for record in iter_records(archive):
+        yield record['result'], chess.Board(), record['moves']
+
+
+def iter_training_positions(games, skip_plies):
+    # (piece planes, White's score 1/0.5/0) for every position of every decided game
+    targets = {'1-0': 1.0, '0-1': 0.0, '1/2-1/2': 0.5}
+    for result, board, moves in games:
+        target = targets.get(result)
+        if target is None:
+            continue
+        for ply, move in enumerate(moves):
+            board.push(move)
+            if ply + 1 >= skip_plies:
+                yield piece_planes(board).reshape(-1), target
+
+
+def log_loss(features, targets, weights):
+    p = 1 / (1 + np.exp(-RESULT_SCALE * (features @ weights)))
+    p = np.clip(p, 1e-9, 1 - 1e-9)
+    return float(-np.mean(targets * np.log(p) + (1 - targets) * np.log(1 - p)))
+
+
+def train(games_dir=config.GAMES_DIR, params=None, archive=None):
+    # Logistic regression of results on piece-square features, regularised towards material values
+    params = params or config.EVAL_PARAMS
+    games = iter_archive_games(archive) if archive else iter_pgn_games(games_dir)
+    rows = []
+    targets = []
+    for row, target in iter_training_positions(games, params['skip_plies']):
+        rows.append(row)
+        targets.append(target)
+    if not rows:
+        return None, 0, None, None
+
+    features = np.array(rows, dtype=np.float64)
+    targets = np.array(targets)
+    prior = material_weights()[:PLANES].reshape(-1)
+    weights = prior.copy()
+    before = log_loss(features, targets, weights)
+
+    for _ in range(params['epochs']):
+        p = 1 / (1 + np.exp(-RESULT_SCALE * (features @ weights)))
+        gradient = RESULT_SCALE * features.T @ (p - targets) / len(targets)
+        gradient += params['l2'] * (weights - prior)
+        weights -= params['learning_rate'] * gradient
+
+    after = log_loss(features, targets, weights)
+    return weights, len(targets), before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit the piece-square evaluation on the games archive')
+    parser.add_argument('--train', action='store_true', help='fit weights on games/ and save them')
+    parser.add_argument('--games-dir', default=config.GAMES_DIR)
+    parser.add_argument('--archive', help='train on a packed .sgr archive instead of the PGN files')
+    args = parser.parse_args()
+
+    if not args.train:
+        parser.print_help()
+        return
+    if np is None:
+        print("❌ NumPy is required to train the evaluation")
+        return
+
+    weights, positions, before, after = train(args.games_dir, archive=args.archive)
+    if weights is None:
+        print(f"❌ No decided games found in {args.archive or args.games_dir}")
+        return
+
+    weights_file = config.EVAL_PARAMS['weights_file']
+    os.makedirs(os.path.dirname(weights_file) or '.', exist_ok=True)
+    np.savez(weights_file, weights=weights)
+    print(f"✅ Trained on {positions} positions, log loss {before:.4f} -> {after:.4f}, saved to {weights_file}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Opening explorer index over Sachin's game archive.
+
+Every position that occurred in an archived game is keyed by its Zobrist hash,
+and each move played from it keeps a count of games and results. The bulk of
+the index lives in a sorted file of fixed-size records that is memory-mapped
+and binary searched, so lookups stay fast however large the archive gets.
+Games saved since the last build are kept in a small in-memory overlay, which
+is merged into the index file once it grows past overlay_max_positions and
+again on shutdown. Merges and the reading of archive files the index hasn't
+seen yet both run on the explorer's own background thread, so neither a
+restart nor a game save ever waits on them.
+
+Rebuild the on-disk index from games/ and games_github/ with:
+
+    python explorer.py --build
+"""
+
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+from collections import defaultdict
+from threading import Event, RLock, Thread
+
+import chess
+import chess.pgn
+import chess.polyglot
+
+import config
+from encoding import encode_move, decode_move
+
+MAGIC = b'SCEX'
+VERSION = 1
+HEADER = struct.Struct('<4sHxxQ')
+# Position hash, 16-bit move, games, white wins, black wins, draws
+RECORD = struct.Struct('<QHIIII')
+
+RESULT_COLUMNS = {'1-0': 1, '0-1': 2, '1/2-1/2': 3}
+
+
+def position_key(board):
+    return chess.polyglot.zobrist_hash(board)
+
+
+def iter_game_positions(moves):
+    # (position hash, move) for every move of a game from the initial position
+    board = chess.Board()
+    for move in moves:
+        yield position_key(board), encode_move(move)
+        board.push(move)
+
+
+def archive_files(dirs):
+    # PGN files across the archive dirs, games_github mirrors games so dedupe by name
+    seen = {}
+    for directory in dirs:
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith('.pgn') and filename not in seen:
+                seen[filename] = os.path.join(directory, filename)
+    return seen
+
+
+class _HashColumn:
+    # Sequence view over the hash column of the mapped records, for bisect
+    def __init__(self, buf, count):
+        self.buf = buf
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return struct.unpack_from('<Q', self.buf, HEADER.size + i * RECORD.size)[0]
+
+
+class ExplorerIndex:
+    def __init__(self, index_file=config.EXPLORER_PARAMS['index_file'],
+                 archive_dirs=(config.GAMES_DIR, config.GITHUB_GAMES_DIR),
+                 overlay_max_positions=config.EXPLORER_PARAMS['overlay_max_positions']):
+        self.index_file = index_file
+        self.files_file = f"{index_file}.files.json"
+        self.archive_dirs = archive_dirs
+        self.overlay_max_positions = overlay_max_positions
+        self.lock = RLock()
+        # Serialises merges and rebuilds, the only writers of the index file
+        self.merge_lock = RLock()
+        self._thread = None
+        # Set by add_game when the overlay needs merging, the explorer thread does the work
+        self._merge_wanted = Event()
+        # Set once the archive files found at startup are indexed
+        self.caught_up = Event()
+        self._file = None
+        self._map = None
+        self._column = None
+        self.count = 0
+        self.indexed_files = set()
+        # position hash -> move code -> [games, white wins, black wins, draws]
+        self.overlay = defaultdict(dict)
+        # Overlay being written into the index file, still counted by lookups until it lands
+        self.merging = {}
+
+    def open(self):
+        with self.lock:
+            self.close()
+            try:
+                with open(self.files_file, 'r') as f:
+                    self.indexed_files = set(json.load(f))
+            except FileNotFoundError:
+                self.indexed_files = set()
+            if not self._map_index():
+                self.indexed_files = set()
+
+        print(f"🔎 Explorer index ready: {self.count} records")
+        return self
+
+    def _map_index(self):
+        # False if the index file has an unknown format and was ignored
+        if os.path.exists(self.index_file) and os.path.getsize(self.index_file) > HEADER.size:
+            self._file = open(self.index_file, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != VERSION:
+                print(f"⚠️ Ignoring explorer index with unknown format: {self.index_file}")
+                self.close()
+                return False
+            self.count = count
+            self._column = _HashColumn(self._map, count)
+        return True
+
+    def start(self):
+        # Index games saved since the last build or merge without holding up startup
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name='explorer-indexer', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            added = self.index_new_files()
+            if added:
+                print(f"🔎 Explorer indexed {added} new games")
+                self.merge()
+        except Exception as e:
+            print(f"Error indexing explorer games: {e}")
+        self.caught_up.set()
+
+        while True:
+            self._merge_wanted.wait()
+            self._merge_wanted.clear()
+            try:
+                self.merge()
+            except Exception as e:
+                print(f"Error merging the explorer index: {e}")
+
+    def close(self):
+        with self.lock:
+            if self._map is not None:
+                self._map.close()
+                self._file.close()
+            self._file = None
+            self._map = None
+            self._column = None
+            self.count = 0
+
+    def index_new_files(self):
+        added = 0
+        for filename, path in archive_files(self.archive_dirs).items():
+            if filename in self.indexed_files:
+                continue
+            games = []
+            with open(path, 'r') as f:
+                while True:
+                    game = chess.pgn.read_game(f)
+                    if game is None:
+                        break
+                    games.append((list(game.mainline_moves()), game.headers.get('Result', '*')))
+            # A file lands in the overlay whole, so a merge never records half of it as indexed
+            with self.lock:
+                if filename in self.indexed_files:
+                    continue  # saved and added by save_game while we were reading
+                for moves, result in games:
+                    self._count_game(moves, result)
+                self.indexed_files.add(filename)
+            added += len(games)
+            # Indexing already runs in the background, so it merges as it goes
+            if len(self.overlay) > self.overlay_max_positions:
+                self.merge()
+        return added
+
+    def add_game(self, filename, moves, result):
+        # Incremental update used by save_game, lands in the in-memory overlay
+        with self.lock:
+            if filename in self.indexed_files:
+                return  # already picked up by the background indexer
+            self._count_game(moves, result)
+            self.indexed_files.add(filename)
+        # Called from the game finalizer, which shouldn't wait on a rewrite of the whole index
+        if len(self.overlay) > self.overlay_max_positions:
+            self._merge_wanted.set()
+
+    def _count_game(self, moves, result):
+        column = RESULT_COLUMNS.get(result)
+        with self.lock:
+            for key, code in iter_game_positions(moves):
+                counts = self.overlay[key].get(code)
+                if counts is None:
+                    counts = self.overlay[key][code] = [0, 0, 0, 0]
+                counts[0] += 1
+                if column:
+                    counts[column] += 1
+
+    def lookup(self, board):
+        # {move: [games, white wins, black wins, draws]} for moves played from this position
+        key = position_key(board)
+        found = {}
+        with self.lock:
+            if self._column is not None:
+                i = bisect.bisect_left(self._column, key)
+                while i < self.count:
+                    h, code, games, white, black, draws = RECORD.unpack_from(
+                        self._map, HEADER.size + i * RECORD.size)
+                    if h != key:
+                        break
+                    found[code] = [games, white, black, draws]
+                    i += 1
+
+            for overlay in (self.merging, self.overlay):
+                for code, counts in overlay.get(key, {}).items():
+                    if code in found:
+                        found[code] = [a + b for a, b in zip(found[code], counts)]
+                    else:
+                        found[code] = list(counts)
+
+        return {decode_move(code): counts for code, counts in found.items()}
+
+    def merge(self):
+        # Fold the overlay into the index file: one pass over the sorted records, no PGN parsing
+        with self.merge_lock:
+            with self.lock:
+                if not self.overlay:
+                    return 0
+                self.merging = self.overlay
+                self.overlay = defaultdict(dict)
+                files = sorted(self.indexed_files)
+                buf, count = self._map, self.count
+
+            added = sorted((key, code, counts) for key, moves in self.merging.items()
+                           for code, counts in moves.items())
+            os.makedirs(os.path.dirname(self.index_file) or '.', exist_ok=True)
+            tmp_file = f"{self.index_file}.tmp"
+            records = 0
+            with open(tmp_file, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, 0))
+                i = j = 0
+                while i < count or j < len(added):
+                    record = RECORD.unpack_from(buf, HEADER.size + i * RECORD.size) if i < count else None
+                    if record and (j == len(added) or record[:2] < added[j][:2]):
+                        f.write(RECORD.pack(*record))
+                        i += 1
+                    elif record and record[:2] == added[j][:2]:
+                        f.write(RECORD.pack(*record[:2], *[a + b for a, b in zip(record[2:], added[j][2])]))
+                        i += 1
+                        j += 1
+                    else:
+                        f.write(RECORD.pack(added[j][0], added[j][1], *added[j][2]))
+                        j += 1
+                    records += 1
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, VERSION, records))
+            with open(f"{self.files_file}.tmp", 'w') as f:
+                json.dump(files, f)
+
+            with self.lock:
+                self.close()
+                os.replace(tmp_file, self.index_file)
+                os.replace(f"{self.files_file}.tmp", self.files_file)
+                self.merging = {}
+                self._map_index()
+            return len(added)
+
+    def build(self):
+        # Full rebuild from the archive into a sorted record file
+        table = defaultdict(lambda: [0, 0, 0, 0])
+        files = archive_files(self.archive_dirs)
+        games = 0
+        for filename, path in files.items():
+            with open(path, 'r') as f:
+                while True:
+                    game = chess.pgn.read_game(f)
+                    if game is None:
+                        break
+                    column = RESULT_COLUMNS.get(game.headers.get('Result', '*'))
+                    for key, code in iter_game_positions(game.mainline_moves()):
+                        counts = table[(key, code)]
+                        counts[0] += 1
+                        if column:
+                            counts[column] += 1
+                    games += 1
+
+        # A merge in progress would replace the file with one built from the old index
+        with self.merge_lock:
+            os.makedirs(os.path.dirname(self.index_file) or '.', exist_ok=True)
+            tmp_file = f"{self.index_file}.tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, len(table)))
+                for (key, code) in sorted(table):
+                    f.write(RECORD.pack(key, code, *table[(key, code)]))
+            with open(f"{self.files_file}.tmp", 'w') as f:
+                json.dump(sorted(files), f)
+
+            with self.lock:
+                self.close()
+                os.replace(tmp_file, self.index_file)
+                os.replace(f"{self.files_file}.tmp", self.files_file)
+                self.overlay = defaultdict(dict)
+            self.open()
+        return games, len(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the opening explorer index')
+    parser.add_argument('--build', action='store_true', help='rebuild the index from the games archive')
+    args = parser.parse_args()
+
+    if not args.build:
+        parser.print_help()
+        return
+
+    games, records = ExplorerIndex().build()
+    print(f"✅ Indexed {games} games into {records} position/move records")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Streaming exports of a user's games and learned policy.
+
+Games are read from the archive one at a time with a header-filtering PGN
+visitor: games that don't match the user, date range or result are skipped
+without parsing their moves, and matching games are re-emitted as PGN text
+without building a move tree. The output is produced by generators in
+chunks, either as one concatenated PGN or as a zip written to a
+non-seekable buffer, so memory stays flat however large the archive is.
+
+Policies are exported from an immutable snapshot as newline-delimited JSON,
+one state per line, without holding the policy lock.
+"""
+
+import io
+import json
+import os
+import time
+import zipfile
+
+import chess.pgn
+
+import config
+
+USER_RESULTS = ('win', 'loss', 'draw')
+PGN_RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+
+def parse_date(value):
+    # 'YYYY-MM-DD' or 'YYYY.MM.DD' -> 'YYYY.MM.DD' as in the PGN Date header
+    time.strptime(value.replace('.', '-'), '%Y-%m-%d')
+    return value.replace('-', '.')
+
+
+def game_filter(username, since=None, until=None, result=None):
+    # headers -> whether the game belongs in the export
+    username = username.lower()
+
+    def matches(headers):
+        white = headers.get('White', '').lower()
+        black = headers.get('Black', '').lower()
+        if username not in (white, black):
+            return False
+        date = headers.get('Date', '????.??.??')
+        if since and (date < since or '?' in date):
+            return False
+        if until and (date > until or '?' in date):
+            return False
+        if result:
+            game_result = headers.get('Result', '*')
+            if result in USER_RESULTS:
+                won = '1-0' if white == username else '0-1'
+                lost = '0-1' if white == username else '1-0'
+                game_result = {won: 'win', lost: 'loss', '1/2-1/2': 'draw'}.get(game_result)
+            if game_result != result:
+                return False
+        return True
+
+    return matches
+
+
+class FilteredExporter(chess.pgn.StringExporter):
+    # PGN text of one game, or '' when its headers don't match and the moves were skipped
+    def __init__(self, matches):
+        super().__init__(headers=True, variations=True, comments=True)
+        self.matches = matches
+        self.game_headers = {}
+        self.skipped = False
+
+    def visit_header(self, tagname, tagvalue):
+        self.game_headers[tagname] = tagvalue
+        super().visit_header(tagname, tagvalue)
+
+    def end_headers(self):
+        if not self.matches(self.game_headers):
+            self.skipped = True
+            return chess.pgn.SKIP
+        return super().end_headers()
+
+    def result(self):
+        return '' if self.skipped else super().result()
+
+
+def iter_matching_games(path, matches):
+    with open(path, 'r') as f:
+        while True:
+            text = chess.pgn.read_game(f, Visitor=lambda: FilteredExporter(matches))
+            if text is None:
+                break
+            if text:
+                yield text + '\n\n'
+
+
+def archive_files(games_dir):
+    if not os.path.isdir(games_dir):
+        return []
+    return [os.path.join(games_dir, filename) for filename in sorted(os.listdir(games_dir))
+            if filename.endswith('.pgn')]
+
+
+def pgn_stream(matches, games_dir=config.GAMES_DIR, chunk_size=config.EXPORT_PARAMS['chunk_size']):
+    # Concatenated PGN of every matching game
+    buffer = []
+    size = 0
+    for path in archive_files(games_dir):
+        for text in iter_matching_games(path, matches):
+            data = text.encode()
+            buffer.append(data)
+            size += len(data)
+            if size >= chunk_size:
+                yield b''.join(buffer)
+                buffer = []
+                size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class StreamBuffer(io.RawIOBase):
+    # Write-only, non-seekable sink for ZipFile, drained by the generator
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+
+def zip_stream(matches, games_dir=config.GAMES_DIR, chunk_size=config.EXPORT_PARAMS['chunk_size']):
+    # One zip entry per archive file that has matching games
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for path in archive_files(games_dir):
+            games = iter_matching_games(path, matches)
+            first = next(games, None)
+            if first is None:
+                continue
+            info = zipfile.ZipInfo(os.path.basename(path), time.localtime(os.path.getmtime(path))[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, 'w') as entry:
+                entry.write(first.encode())
+                for text in games:
+                    entry.write(text.encode())
+                    if buffer.size >= chunk_size:
+                        yield buffer.drain()
+            if buffer.size >= chunk_size:
+                yield buffer.drain()
+    yield buffer.drain()
+
+
+def policy_stream(snapshot, chunk_size=config.EXPORT_PARAMS['chunk_size']):
+    # {"key": canonical position, "moves": {uci: weight}} per line
+    buffer = []
+    size = 0
+    for key, entry in snapshot.items():
+        line = json.dumps({'key': key, 'moves': entry}, separators=(',', ':')) + '\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(buffer).encode()
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode()
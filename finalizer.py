@@ -0,0 +1,71 @@
+"""
+Background writer for Sachin's finished games.
+
+The request that ends a game only settles the result in memory (status,
+result header, stats counters, loss streak) and queues a record of the
+finished game here. A worker thread then does the slow parts in order: the
+PGN file, the binary archive, the explorer overlay, analytics and the stats
+file. Policy learning goes to the PolicyLearner queue instead.
+"""
+
+import queue
+from threading import Thread, Lock
+
+_STOP = object()
+
+
+class GameFinalizer:
+    def __init__(self, write_game):
+        # write_game(record) persists one finished game
+        self.write_game = write_game
+        self.queue = queue.Queue()
+        self.games_written = 0
+        self.failures = 0
+        self._stats_lock = Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name='game-finalizer', daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, record):
+        self.queue.put(record)
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def flush(self):
+        # Block until everything queued so far has been written
+        self.queue.join()
+
+    def stop(self):
+        if self._thread is not None:
+            self.queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'pending': self.pending(),
+                'games_written': self.games_written,
+                'failures': self.failures,
+            }
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            if record is _STOP:
+                self.queue.task_done()
+                return
+            try:
+                self.write_game(record)
+                with self._stats_lock:
+                    self.games_written += 1
+            except Exception as e:
+                print(f"Error writing finished game: {e}")
+                with self._stats_lock:
+                    self.failures += 1
+            self.queue.task_done()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Bot move latency report from Sachin's saved games.
+
+Every bot move in a saved PGN carries its think time as a [%emt] comment and
+where the move came from as [%source] (policy, heuristic, search or
+tablebase). This script streams the archive one game at a time and prints
+the think time distribution per time control and per move source. Games
+saved before the comments existed are counted but have no timings.
+
+    python latency_report.py
+    python latency_report.py games games_github --json latency.json
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+
+import chess
+import chess.pgn
+
+import config
+from analytics import time_control_from_header
+
+SOURCE_RE = re.compile(r"\[%source\s+(\w+)\]")
+PERCENTILES = (50, 90, 99)
+
+
+def iter_games(path):
+    # One game in memory at a time
+    with open(path, 'r') as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            yield game
+
+
+def bot_move_times(game):
+    # [(source, think time in seconds)] for the bot moves that carry a [%emt]
+    bot_color = chess.WHITE if game.headers.get('White', '').lower() == 'sachin' else chess.BLACK
+    times = []
+    for node in game.mainline():
+        if node.turn() == bot_color:
+            continue  # the bot is to move after this ply, so the human played it
+        think_time = node.emt()
+        if think_time is not None:
+            match = SOURCE_RE.search(node.comment)
+            times.append((match.group(1) if match else 'unknown', think_time))
+    return times
+
+
+def percentile(values, p):
+    # Nearest rank on sorted values
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def distribution(values):
+    values = sorted(values)
+    if not values:
+        return {'moves': 0}
+    summary = {
+        'moves': len(values),
+        'mean_ms': sum(values) / len(values) * 1000,
+        'max_ms': values[-1] * 1000,
+    }
+    for p in PERCENTILES:
+        summary[f'p{p}_ms'] = percentile(values, p) * 1000
+    return summary
+
+
+def build_report(directories):
+    by_time_control = {}
+    by_source = {}
+    files = 0
+    games = 0
+    for directory in directories:
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith('.pgn'):
+                continue
+            files += 1
+            for game in iter_games(os.path.join(directory, filename)):
+                games += 1
+                time_control = time_control_from_header(game.headers.get('TimeControl'))
+                for source, think_time in bot_move_times(game):
+                    by_time_control.setdefault(time_control, []).append(think_time)
+                    by_source.setdefault(source, []).append(think_time)
+
+    return {
+        'files': files,
+        'games': games,
+        'timed_moves': sum(len(values) for values in by_source.values()),
+        'by_time_control': {name: distribution(values) for name, values in sorted(by_time_control.items())},
+        'by_source': {name: distribution(values) for name, values in sorted(by_source.items())},
+    }
+
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    print(f"  {'':<12} {'moves':>7} {'mean ms':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, row in rows.items():
+        print(f"  {name:<12} {row['moves']:>7} {row['mean_ms']:>9.3f} {row['p50_ms']:>9.3f} "
+              f"{row['p90_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['max_ms']:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bot move latency distributions from saved games')
+    parser.add_argument('directories', nargs='*', default=[config.GAMES_DIR], help='directories of PGN files')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    report = build_report(args.directories)
+    print(f"📊 {report['games']} games in {report['files']} files, {report['timed_moves']} timed bot moves")
+    if report['timed_moves']:
+        print_table('By time control', report['by_time_control'])
+        print_table('By move source', report['by_source'])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
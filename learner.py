@@ -0,0 +1,108 @@
+"""
+Background learner for Sachin's policy.
+
+Finished games are queued as records and applied in batches on a worker
+thread, so the request that ends a game only pays for an enqueue. After each
+batch the touched policies are published once, however many games the batch
+contained.
+"""
+
+import queue
+import time
+from threading import Thread, Lock
+
+_STOP = object()
+
+
+class PolicyLearner:
+    def __init__(self, apply_game, publish, batch_size=16, batch_wait=0.5):
+        # apply_game(record) updates the in-memory policy for one finished game,
+        # publish(username) persists the result once per batch
+        self.apply_game = apply_game
+        self.publish = publish
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.queue = queue.Queue()
+        self.versions = {}
+        self.games_applied = 0
+        self.batches_applied = 0
+        self._stats_lock = Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name='policy-learner', daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, record):
+        # record: {'username', 'outcome', 'moves', 'human_color', 'learning_boost_active'}
+        self.queue.put(record)
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def flush(self):
+        # Block until everything queued so far has been applied and published
+        self.queue.join()
+
+    def stop(self):
+        if self._thread is not None:
+            self.queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def process_batch(self, records):
+        touched = []
+        for record in records:
+            try:
+                self.apply_game(record)
+            except Exception as e:
+                print(f"Error applying game to policy: {e}")
+                continue
+            if record['username'] not in touched:
+                touched.append(record['username'])
+
+        for username in touched:
+            try:
+                self.publish(username)
+            except Exception as e:
+                print(f"Error publishing policy for {username}: {e}")
+                continue
+            with self._stats_lock:
+                self.versions[username] = self.versions.get(username, 0) + 1
+
+        with self._stats_lock:
+            self.games_applied += len(records)
+            self.batches_applied += 1
+
+    def _next_batch(self):
+        first = self.queue.get()
+        if first is _STOP:
+            return None, True
+
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                record = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if record is _STOP:
+                return batch, True
+            batch.append(record)
+        return batch, False
+
+    def _run(self):
+        while True:
+            batch, stopping = self._next_batch()
+            if batch:
+                self.process_batch(batch)
+                for _ in batch:
+                    self.queue.task_done()
+            if stopping:
+                self.queue.task_done()
+                return
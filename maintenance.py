@@ -0,0 +1,179 @@
+"""
+Policy aging and compaction for Sachin.
+
+Each learned state keeps a little metadata: the learning clock (number of
+games learned) when it was last seen and how often it was visited. A
+background thread sweeps the table a chunk at a time, decaying weights of
+states not seen for a window of games and, while the table is over its size
+cap, evicting the lowest-value cold states. Recently seen states are never
+evicted, so hot openings stay resident. Each chunk is published to readers
+as one new version of the user's PolicyStore.
+"""
+
+import os
+import pickle
+import time
+from threading import Thread
+
+import config
+
+
+class PolicyMaintainer:
+    def __init__(self, policies, lock, publish, params=None, learning_params=None):
+        params = params or config.POLICY_MAINTENANCE
+        learning_params = learning_params or config.LEARNING_PARAMS
+        self.policies = policies
+        self.lock = lock
+        self.publish = publish
+        self.decay_factor = learning_params['decay_factor']
+        self.window_size = learning_params['window_size']
+        self.max_states = params['max_states']
+        self.chunk_size = params['chunk_size']
+        self.interval = params['interval']
+        self.min_weight = params['min_weight']
+        self.hot_games = params['hot_games']
+        # username -> games learned so far
+        self.clock = {}
+        # username -> key -> [last seen game, visits, last decayed game]
+        self.meta = {}
+        self._sweeps = {}
+        self._changed = set()
+        self.decayed = 0
+        self.evicted = 0
+        self._thread = None
+
+    def meta_file(self, username):
+        return os.path.join(config.MEMORY_DIR, username, 'policy_meta.pkl')
+
+    def load(self, username):
+        try:
+            with open(self.meta_file(username), 'rb') as f:
+                saved = pickle.load(f)
+            self.clock[username] = saved['clock']
+            self.meta[username] = saved['meta']
+        except FileNotFoundError:
+            self.clock[username] = 0
+            self.meta[username] = {}
+
+    def save(self, username):
+        if username not in self.meta:
+            return
+        with self.lock:
+            payload = {'clock': self.clock[username], 'meta': dict(self.meta[username])}
+        tmp_file = f"{self.meta_file(username)}.tmp"
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(payload, f)
+        os.replace(tmp_file, self.meta_file(username))
+
+    def touch(self, username, key):
+        # Mark a state as used, by learning or by a policy hit
+        if username not in self.meta:
+            return
+        meta = self.meta[username]
+        now = self.clock[username]
+        entry = meta.get(key)
+        if entry is None:
+            meta[key] = [now, 1, now]
+        else:
+            entry[0] = now
+            entry[1] += 1
+
+    def advance(self, username):
+        # One more game learned
+        if username not in self.meta:
+            return
+        self.clock[username] += 1
+
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name='policy-maintenance', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                for username in list(self.meta):
+                    if username in self.policies:
+                        self.step(username)
+            except Exception as e:
+                print(f"Error in policy maintenance: {e}")
+            time.sleep(self.interval)
+
+    def step(self, username):
+        # Process one chunk of the current sweep, starting a new sweep when done
+        store = self.policies[username]
+        sweep = self._sweeps.get(username)
+        if not sweep:
+            sweep = list(store.snapshot().keys())
+            self._sweeps[username] = sweep
+            if not sweep:
+                return
+
+        chunk = sweep[-self.chunk_size:]
+        del sweep[-self.chunk_size:]
+
+        with self.lock, store.write() as writer:
+            self._decay_chunk(username, writer, chunk)
+            if len(writer) > self.max_states:
+                self._evict_chunk(username, writer, chunk)
+
+        # Persist once per sweep rather than per chunk
+        if not sweep and username in self._changed:
+            self._changed.discard(username)
+            self.publish(username)
+
+    def _decay_chunk(self, username, policy, chunk):
+        meta = self.meta[username]
+        now = self.clock[username]
+
+        for key in chunk:
+            entry = policy.get(key)
+            if entry is None:
+                continue
+            info = meta.setdefault(key, [now, 1, now])
+            since = max(info[0], info[2])
+            periods = (now - since) // self.window_size
+            if periods <= 0:
+                continue
+
+            # Published entries are immutable, the decayed weights go in a new one
+            factor = self.decay_factor ** periods
+            decayed = {}
+            for move_uci, weight in entry.items():
+                weight *= factor
+                if abs(weight) >= self.min_weight:
+                    decayed[move_uci] = weight
+            policy.set(key, decayed)
+            info[2] = since + periods * self.window_size
+            self.decayed += 1
+            self._changed.add(username)
+
+            if not decayed:
+                meta.pop(key, None)
+
+    def _value(self, entry, info, now):
+        # Visits and total weight, discounted by how long ago the state was seen
+        return info[1] * sum(abs(w) for w in entry.values()) / (1 + now - info[0])
+
+    def _evict_chunk(self, username, policy, chunk):
+        meta = self.meta[username]
+        now = self.clock[username]
+
+        candidates = []
+        for key in chunk:
+            entry = policy.get(key)
+            if entry is None:
+                continue
+            info = meta.setdefault(key, [now, 1, now])
+            if now - info[0] < self.hot_games:
+                continue
+            candidates.append((self._value(entry, info, now), key))
+
+        candidates.sort()
+        excess = len(policy) - self.max_states
+        for _, key in candidates[:excess]:
+            policy.delete(key)
+            meta.pop(key, None)
+            self.evicted += 1
+            self._changed.add(username)
@@ -0,0 +1,168 @@
+"""
+Compact in-memory state for Sachin's games and players.
+
+GameState replaces the per-game dict: fixed __slots__ fields, clocks indexed
+by chess colour, and an array-backed move log (16-bit packed moves plus one
+signed capture code, move source, think time and clock reading per ply)
+instead of a dict per move. UserStats holds the win/loss counters that are
+persisted as memory/<user>/stats.json; valid_username guards the <user> part
+of that path and every other per-user file.
+"""
+
+import re
+from array import array
+from threading import RLock
+
+import chess
+
+import config
+from encoding import encode_move, decode_move
+
+
+# Where a ply came from, stored as an index into MOVE_SOURCES
+MOVE_SOURCES = ('human', 'policy', 'heuristic', 'search', 'tablebase')
+UNKNOWN_SOURCE = -1
+NO_TIME = -1.0
+
+
+def valid_username(username):
+    return isinstance(username, str) and re.fullmatch(config.USERNAME_PATTERN, username) is not None
+
+
+def capture_code(piece):
+    # 0 for no capture, +piece type for a white piece, -piece type for a black one
+    if piece is None:
+        return 0
+    return piece.piece_type if piece.color == chess.WHITE else -piece.piece_type
+
+
+def capture_symbol(code):
+    if code == 0:
+        return None
+    symbol = chess.PIECE_SYMBOLS[abs(code)]
+    return symbol.upper() if code > 0 else symbol
+
+
+class GameState:
+    __slots__ = (
+        'board', 'headers', 'human_color', 'username', 'time_control',
+        'timers', 'timers_enabled', 'last_move_time', 'game_status',
+        'bot_loss_streak', 'learning_boost_active', 'bot_think_time', 'bot_moves',
+        'moves', 'captures', 'sources', 'think_times', 'clocks', 'turn', 'lock', 'finalized',
+    )
+
+    def __init__(self, username, human_color, time_control, seconds, timers_enabled, last_move_time):
+        self.board = chess.Board()
+        self.headers = {}  # PGN headers, the chess.pgn tree is only built on export
+        self.human_color = human_color
+        self.username = username
+        self.time_control = time_control
+        # Remaining seconds indexed by colour: [black, white]
+        self.timers = [float(seconds), float(seconds)]
+        self.timers_enabled = timers_enabled
+        self.last_move_time = last_move_time
+        self.game_status = 'active'
+        self.bot_loss_streak = 0
+        self.learning_boost_active = False
+        self.bot_think_time = 0.0
+        self.bot_moves = 0
+        self.moves = array('H')
+        self.captures = array('b')
+        # Per ply: MOVE_SOURCES index, seconds spent choosing the move and the
+        # mover's clock after it, NO_TIME when not measured or untimed
+        self.sources = array('b')
+        self.think_times = array('f')
+        self.clocks = array('f')
+        # Side to move while the board is still being restored from a snapshot
+        self.turn = None
+        # Guards the fields above; the end-of-game bookkeeping runs once per game
+        self.lock = RLock()
+        self.finalized = False
+
+    def push(self, move, source='human', think_time=None, clock=None):
+        # Play a move on the board and append it to the move log
+        board = self.board
+        captured = board.piece_at(move.to_square) if board.is_capture(move) else None
+        board.push(move)
+        self.moves.append(encode_move(move))
+        self.captures.append(capture_code(captured))
+        self.sources.append(MOVE_SOURCES.index(source))
+        self.think_times.append(NO_TIME if think_time is None else think_time)
+        self.clocks.append(NO_TIME if clock is None else clock)
+        return captured
+
+    def pop(self):
+        self.board.pop()
+        self.moves.pop()
+        self.captures.pop()
+        self.sources.pop()
+        self.think_times.pop()
+        self.clocks.pop()
+
+    def ply_count(self):
+        return len(self.moves)
+
+    def move_list(self):
+        return [decode_move(code) for code in self.moves]
+
+    def last_move(self):
+        return decode_move(self.moves[-1]) if self.moves else None
+
+    def move_data(self):
+        # [(source, think time, clock)] per ply, None where unknown
+        return [(MOVE_SOURCES[source] if source != UNKNOWN_SOURCE else None,
+                 None if think_time == NO_TIME else think_time,
+                 None if clock == NO_TIME else clock)
+                for source, think_time, clock in zip(self.sources, self.think_times, self.clocks)]
+
+    def last_capture(self):
+        return capture_symbol(self.captures[-1]) if self.captures else None
+
+    def captured_pieces(self):
+        # Symbols of captured pieces, grouped by the colour of the captured piece
+        captured_white = []
+        captured_black = []
+        for code in self.captures:
+            if code > 0:
+                captured_white.append(capture_symbol(code))
+            elif code < 0:
+                captured_black.append(capture_symbol(code))
+        return {'white': captured_white, 'black': captured_black}
+
+    def side_to_move(self):
+        if self.board is None:
+            return self.turn
+        return self.board.turn
+
+    def current_player(self):
+        return 'white' if self.side_to_move() == chess.WHITE else 'black'
+
+    def timers_dict(self):
+        return {'white': self.timers[chess.WHITE], 'black': self.timers[chess.BLACK]}
+
+    def hydrate(self):
+        # Replay the move log into a board for games restored from a snapshot
+        if self.board is None:
+            board = chess.Board()
+            for code in self.moves:
+                board.push(decode_move(code))
+            self.board = board
+            self.turn = None
+        return self
+
+
+class UserStats:
+    __slots__ = ('wins', 'losses', 'draws', 'games_played')
+
+    def __init__(self, wins=0, losses=0, draws=0, games_played=0):
+        self.wins = wins
+        self.losses = losses
+        self.draws = draws
+        self.games_played = games_played
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('wins', 0), data.get('losses', 0), data.get('draws', 0), data.get('games_played', 0))
+
+    def to_dict(self):
+        return {'wins': self.wins, 'losses': self.losses, 'draws': self.draws, 'games_played': self.games_played}
@@ -0,0 +1,210 @@
+"""
+Versioned, read-copy-update policy tables for Sachin.
+
+Readers take the store's current PolicySnapshot and use it without locking.
+A published snapshot, and every move-weight dict inside it, is never modified
+again. Writers stage replacement entries in a PolicyWriter under the store's
+lock and publish the next version with a single reference swap, so a reader
+sees either the old table or the new one, never a half-applied game.
+
+To keep writes cheap on large tables a snapshot is a shared base table plus a
+small delta of replaced or deleted states. Once the delta grows past
+max_delta it is folded into a fresh base.
+
+PolicyFileWatcher polls policy files and hot-reloads any that were replaced
+on disk by something other than this process.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from threading import RLock, Thread
+
+import config
+
+_ABSENT = object()
+
+
+class PolicySnapshot:
+    __slots__ = ('version', 'base', 'delta', 'size')
+
+    def __init__(self, version, base, delta, size):
+        self.version = version
+        self.base = base
+        # key -> entry, or None for a state deleted since the base was built
+        self.delta = delta
+        self.size = size
+
+    def get(self, key, default=None):
+        entry = self.delta.get(key, _ABSENT)
+        if entry is _ABSENT:
+            entry = self.base.get(key)
+        return default if entry is None else entry
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return self.size
+
+    def keys(self):
+        for key, _ in self.items():
+            yield key
+
+    def items(self):
+        delta = self.delta
+        for key, entry in self.base.items():
+            if key not in delta:
+                yield key, entry
+        for key, entry in delta.items():
+            if entry is not None:
+                yield key, entry
+
+    def to_dict(self):
+        # Plain {key: {move: weight}} table; entries are shared, not copied
+        return dict(self.items())
+
+
+class PolicyWriter:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.staged = {}
+
+    def get(self, key):
+        entry = self.staged.get(key, _ABSENT)
+        if entry is _ABSENT:
+            return self.snapshot.get(key)
+        return entry or None
+
+    def entry(self, key):
+        # Private copy of a state's move weights, staged for the next version
+        entry = self.staged.get(key, _ABSENT)
+        if entry is _ABSENT:
+            entry = dict(self.snapshot.get(key, ()))
+        elif entry is None:
+            entry = {}
+        self.staged[key] = entry
+        return entry
+
+    def set(self, key, entry):
+        # An empty entry removes the state
+        self.staged[key] = entry
+
+    def delete(self, key):
+        self.staged[key] = None
+
+    def __len__(self):
+        size = self.snapshot.size
+        for key, entry in self.staged.items():
+            size += bool(entry) - (key in self.snapshot)
+        return size
+
+
+class PolicyStore:
+    def __init__(self, table=None, lock=None, max_delta=None):
+        table = dict(table or {})
+        self.lock = lock or RLock()
+        self.max_delta = max_delta or config.POLICY_STORE['max_delta']
+        self.current = PolicySnapshot(0, table, {}, len(table))
+
+    def snapshot(self):
+        # Lock-free: attribute reads are atomic and snapshots are immutable
+        return self.current
+
+    def __len__(self):
+        return len(self.current)
+
+    @contextmanager
+    def write(self):
+        # Writers are serialised on the lock, readers never wait on it
+        with self.lock:
+            writer = PolicyWriter(self.current)
+            yield writer
+            if writer.staged:
+                self.commit(writer)
+
+    def commit(self, writer):
+        old = self.current
+        base = old.base
+        delta = dict(old.delta)
+        size = old.size
+        for key, entry in writer.staged.items():
+            existed = key in old
+            if entry:
+                delta[key] = entry
+            elif key in base:
+                delta[key] = None
+            else:
+                delta.pop(key, None)
+            size += bool(entry) - existed
+
+        if len(delta) > self.max_delta:
+            # Fold the delta into a new base so lookups stay a single probe
+            base = dict(base)
+            for key, entry in delta.items():
+                if entry is None:
+                    base.pop(key, None)
+                else:
+                    base[key] = entry
+            delta = {}
+
+        self.current = PolicySnapshot(old.version + 1, base, delta, size)
+        return self.current
+
+    def replace(self, table):
+        # Hot reload: publish a whole new table as the next version
+        table = dict(table)
+        with self.lock:
+            self.current = PolicySnapshot(self.current.version + 1, table, {}, len(table))
+            return self.current
+
+
+class PolicyFileWatcher:
+    def __init__(self, files, reload, interval=None, lock=None):
+        # files() -> {username: policy file}, reload(username) loads one from disk;
+        # lock is held by our own saves from the file swap until mark()
+        self.files = files
+        self.reload = reload
+        self.interval = interval or config.POLICY_STORE['watch_interval']
+        self.lock = lock or RLock()
+        self.mtimes = {}
+        self.reloads = 0
+        self._thread = None
+
+    def mark(self, username, path):
+        # Record our own writes so they aren't mistaken for external ones
+        try:
+            self.mtimes[username] = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            self.mtimes.pop(username, None)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name='policy-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Error watching policy files: {e}")
+
+    def check(self):
+        reloaded = []
+        for username, path in self.files().items():
+            # A save in progress has swapped the file but not marked it yet, so wait for it
+            with self.lock:
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+                previous = self.mtimes.get(username)
+                self.mtimes[username] = mtime
+                if previous is not None and previous != mtime:
+                    self.reload(username)
+                    self.reloads += 1
+                    reloaded.append(username)
+        return reloaded
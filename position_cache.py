@@ -0,0 +1,94 @@
+"""
+Process-wide cache of per-position analysis for Sachin.
+
+Positions that come up again and again (openings above all) are analysed
+once: legal moves, whether the position is terminal on its own (mate,
+stalemate, insufficient material) and the heuristic move scores. Entries are
+keyed by the board's transposition key and evicted least-recently-used.
+
+The 75-move rule and fivefold repetition depend on the game's history rather
+than the position, so those are still checked on the live board.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+
+import chess
+
+import config
+
+
+class PositionEntry:
+    __slots__ = ('legal_moves', 'static_result', 'scores')
+
+    def __init__(self, legal_moves, static_result):
+        self.legal_moves = legal_moves
+        self.static_result = static_result
+        # [(move, heuristic or evaluation score, development bonus)], filled on first use
+        self.scores = None
+
+
+def static_result(board, legal_moves):
+    # Result decided by the position alone, or None
+    if not legal_moves:
+        if board.is_check():
+            return '0-1' if board.turn == chess.WHITE else '1-0'
+        return '1/2-1/2'
+    if board.is_insufficient_material():
+        return '1/2-1/2'
+    return None
+
+
+class PositionCache:
+    def __init__(self, max_entries=config.POSITION_CACHE['max_entries']):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def entry(self, board):
+        key = board._transposition_key()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        moves = tuple(board.legal_moves)
+        entry = PositionEntry(moves, static_result(board, moves))
+
+        with self.lock:
+            self.entries[key] = entry
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def legal_moves(self, board):
+        return self.entry(board).legal_moves
+
+    def is_game_over(self, board):
+        # Same outcome as board.is_game_over() without re-generating moves
+        if self.entry(board).static_result is not None:
+            return True
+        return board.is_seventyfive_moves() or board.is_fivefold_repetition()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
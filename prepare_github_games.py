@@ -2,61 +2,279 @@
 """
 Script to prepare games for GitHub repository.
 This script organizes and formats game files for public sharing.
+
+Publishing is incremental: games_github/manifest.json keeps a content hash
+and a streamed statistics summary for every published game file, so each run
+only hashes, links (or copies) and parses files that are new or changed. New
+files are handled in parallel worker processes, appended to a bundled PGN of
+all games, and the README and summary.json are rebuilt from the per-file
+summaries already in the manifest.
 """
 
-import os
+import argparse
+import hashlib
 import json
+import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
-def prepare_games():
-    # Create the games_github directory if it doesn't exist
-    os.makedirs('games_github', exist_ok=True)
-    
-    # Copy all PGN files from games to games_github
-    if os.path.exists('games'):
-        for filename in os.listdir('games'):
+import chess.pgn
+
+import config
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+
+def empty_summary():
+    return {
+        'games': 0,
+        'plies': 0,
+        'results': {result: 0 for result in RESULTS},
+        'sachin': {'wins': 0, 'losses': 0, 'draws': 0},
+        'opponents': {},
+    }
+
+
+def merge_summary(total, summary):
+    total['games'] += summary['games']
+    total['plies'] += summary['plies']
+    for result, count in summary['results'].items():
+        total['results'][result] = total['results'].get(result, 0) + count
+    for key, count in summary['sachin'].items():
+        total['sachin'][key] += count
+    for name, count in summary['opponents'].items():
+        total['opponents'][name] = total['opponents'].get(name, 0) + count
+    return total
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def summarize_pgn(path):
+    # Stream the games in one file, one game in memory at a time
+    summary = empty_summary()
+    with open(path, 'r') as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            headers = game.headers
+            result = headers.get('Result', '*')
+            summary['games'] += 1
+            summary['plies'] += game.end().ply()
+            summary['results'][result if result in RESULTS else '*'] += 1
+
+            # Results from Sachin's side, whichever colour it played
+            sachin_white = headers.get('White', '').lower() == 'sachin'
+            opponent = headers.get('Black' if sachin_white else 'White', '?')
+            summary['opponents'][opponent] = summary['opponents'].get(opponent, 0) + 1
+            if result == '1/2-1/2':
+                summary['sachin']['draws'] += 1
+            elif result == ('1-0' if sachin_white else '0-1'):
+                summary['sachin']['wins'] += 1
+            elif result in ('1-0', '0-1'):
+                summary['sachin']['losses'] += 1
+    return summary
+
+
+def publish_file(src, dest, link):
+    # Worker: hash, place and summarise one game file
+    digest = file_hash(src)
+    if src != dest:
+        if os.path.exists(dest):
+            os.remove(dest)
+        placed = False
+        if link:
+            try:
+                os.link(src, dest)
+                placed = True
+            except OSError:
+                pass  # different filesystem or no hardlink support, fall back to a copy
+        if not placed:
+            shutil.copy2(src, dest)
+    stat = os.stat(dest)
+    return {
+        'sha256': digest,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'summary': summarize_pgn(dest),
+    }
+
+
+def load_manifest(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'files': {}, 'bundle_bytes': 0}
+
+
+def save_manifest(path, manifest):
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_file, path)
+
+
+def unchanged(entry, path):
+    # Size and mtime match what was published, skip hashing the file
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    return entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+
+
+def find_changes(manifest, games_dir, publish_dir):
+    # filename -> source path for files that are new or changed
+    pending = {}
+    if os.path.exists(games_dir):
+        for filename in os.listdir(games_dir):
             if filename.endswith('.pgn'):
-                src = os.path.join('games', filename)
-                dest = os.path.join('games_github', filename)
-                shutil.copy2(src, dest)
-                print(f"Copied {filename} to games_github")
-    
+                src = os.path.join(games_dir, filename)
+                entry = manifest['files'].get(filename)
+                if not unchanged(entry, os.path.join(publish_dir, filename)) or not unchanged(entry, src):
+                    pending[filename] = src
+
+    # Games already in games_github that were never recorded (first run, hand-added files)
+    published = set()
+    for filename in os.listdir(publish_dir):
+        if filename.endswith('.pgn'):
+            published.add(filename)
+            entry = manifest['files'].get(filename)
+            if filename not in pending and not unchanged(entry, os.path.join(publish_dir, filename)):
+                pending[filename] = os.path.join(publish_dir, filename)
+
+    # Published files deleted by hand drop out of the manifest
+    removed = [filename for filename in manifest['files'] if filename not in published and filename not in pending]
+    return pending, removed
+
+
+def append_to_bundle(bundle_path, publish_dir, filenames):
+    size = 0
+    with open(bundle_path, 'ab') as bundle:
+        for filename in filenames:
+            with open(os.path.join(publish_dir, filename), 'rb') as f:
+                data = f.read().strip()
+            if data:
+                bundle.write(data + b'\n\n')
+        bundle.flush()
+        size = bundle.tell()
+    return size
+
+
+def prepare_games(workers=None, link=None):
+    params = config.PUBLISH_PARAMS
+    games_dir = config.GAMES_DIR
+    publish_dir = config.GITHUB_GAMES_DIR
+    link = params['link'] if link is None else link
+    workers = workers or params['workers'] or os.cpu_count()
+
+    # Create the games_github directory if it doesn't exist
+    os.makedirs(publish_dir, exist_ok=True)
+    os.makedirs(os.path.dirname(params['bundle']), exist_ok=True)
+
+    manifest = load_manifest(params['manifest'])
+    pending, removed = find_changes(manifest, games_dir, publish_dir)
+    for filename in removed:
+        del manifest['files'][filename]
+
+    # Hash, link/copy and summarise new or changed files in parallel
+    published = {}
+    if pending:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            futures = {
+                filename: pool.submit(publish_file, src, os.path.join(publish_dir, filename), link)
+                for filename, src in pending.items()
+            }
+            for filename, future in futures.items():
+                published[filename] = future.result()
+
+    # Identical content re-saved with a new mtime isn't a change
+    changed = [name for name, entry in published.items()
+               if manifest['files'].get(name, {}).get('sha256') != entry['sha256']]
+    rewritten = [name for name in changed if name in manifest['files']]
+    manifest['files'].update(published)
+    for filename in sorted(changed):
+        print(f"Published {filename} to {publish_dir}")
+
+    # Append new games to the bundle, rebuild it if a published file changed or it is out of step
+    bundle_path = params['bundle']
+    bundle_size = os.path.getsize(bundle_path) if os.path.exists(bundle_path) else 0
+    if rewritten or removed or bundle_size != manifest['bundle_bytes']:
+        if os.path.exists(bundle_path):
+            os.remove(bundle_path)
+        manifest['bundle_bytes'] = append_to_bundle(bundle_path, publish_dir, sorted(manifest['files']))
+    elif changed:
+        manifest['bundle_bytes'] = append_to_bundle(bundle_path, publish_dir, sorted(changed))
+    save_manifest(params['manifest'], manifest)
+
+    # Statistics from the per-file summaries, no game is parsed twice
+    summary = empty_summary()
+    for entry in manifest['files'].values():
+        merge_summary(summary, entry['summary'])
+    summary['files'] = len(manifest['files'])
+    with open(params['summary'], 'w') as f:
+        json.dump(summary, f, indent=2, sort_keys=True)
+
     # Create a README file with statistics
-    create_readme()
-    
-    print("✅ Games prepared for GitHub")
-
-def create_readme():
-    # Try to load stats
-    stats = {}
-    if os.path.exists('memory/jakhar/stats.json'):
-        with open('memory/jakhar/stats.json', 'r') as f:
-            stats = json.load(f)
-    
+    create_readme(summary)
+
+    print(f"✅ Games prepared for GitHub: {len(changed)} new or changed files, {summary['games']} games in total")
+    return summary
+
+
+def create_readme(summary):
+    sachin = summary['sachin']
+    average_length = summary['plies'] / summary['games'] if summary['games'] else 0
+    opponents = sorted(summary['opponents'].items(), key=lambda item: item[1], reverse=True)
+    opponent_lines = '\n'.join(f"- {name}: {count}" for name, count in opponents) or '- None yet'
+    bundle_name = os.path.relpath(config.PUBLISH_PARAMS['bundle'], config.GITHUB_GAMES_DIR)
+
     # Create README content
     readme_content = f"""# Sachin Chess Games
 
 This repository contains chess games played against Sachin, the learning chess bot.
 
 ## Statistics
-- Total games: {stats.get('games_played', 0)}
-- Wins: {stats.get('wins', 0)}
-- Losses: {stats.get('losses', 0)}
-- Draws: {stats.get('draws', 0)}
+- Total games: {summary['games']}
+- Sachin wins: {sachin['wins']}
+- Sachin losses: {sachin['losses']}
+- Draws: {sachin['draws']}
+- Average game length: {average_length:.1f} plies
+
+## Opponents
+{opponent_lines}
 
 ## About Sachin
 Sachin is a chess bot that learns from its games. It uses a policy-based reinforcement learning approach to improve its play over time.
 
 ## Game Files
 All games are stored in PGN format, which can be viewed with any chess software or online PGN viewer.
+Every game is also collected in a single file, `{bundle_name}`.
 
 Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
-    
+
     # Write README file
-    with open('games_github/README.md', 'w') as f:
+    with open(os.path.join(config.GITHUB_GAMES_DIR, 'README.md'), 'w') as f:
         f.write(readme_content)
 
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish new games to games_github')
+    parser.add_argument('--workers', type=int, help='parallel worker processes (default: CPU count)')
+    parser.add_argument('--copy', action='store_true', help='copy files instead of hardlinking them')
+    args = parser.parse_args()
+
+    prepare_games(workers=args.workers, link=False if args.copy else None)
+
+
 if __name__ == '__main__':
-    prepare_games()
\ No newline at end of file
+    main()
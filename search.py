@@ -0,0 +1,313 @@
+"""
+Parallel alpha-beta search for Sachin's long time controls.
+
+Iterative deepening negamax with a quiescence search, material and
+centralisation evaluation and a per-process transposition table. Each depth
+is split at the root: the previous depth's best move is searched first to
+set a bound, then the remaining root moves are handed out to a pool of
+worker processes one at a time. Every worker reads and raises a shared best
+score, so a good move found by one worker narrows the window for the others.
+
+The pool is forked once and reused; with one worker the search runs in the
+calling process. Searches stop at the first depth boundary past the time
+limit, or mid-depth at the deadline, returning the last completed depth.
+"""
+
+import itertools
+import multiprocessing
+import os
+import time
+from threading import Lock, Semaphore
+
+import chess
+
+import config
+
+PIECE_VALUES = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 320,
+    chess.BISHOP: 330,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 0
+}
+MATE = 100000
+INFINITY = MATE + 1
+CENTRE = chess.BB_D4 | chess.BB_E4 | chess.BB_D5 | chess.BB_E5
+EXTENDED_CENTRE = 0x00003C3C3C3C0000
+TT_MAX_ENTRIES = 500000
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchResult:
+    __slots__ = ('move', 'score', 'depth', 'nodes', 'elapsed', 'depth_times')
+
+    def __init__(self, move, score, depth, nodes, elapsed, depth_times):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        # Seconds from the start of the search to the end of each completed depth
+        self.depth_times = depth_times
+
+
+def evaluate(board):
+    # Material and centre control, from the side to move's point of view
+    score = 0
+    for piece_type, value in PIECE_VALUES.items():
+        if value:
+            score += value * (chess.popcount(board.pieces_mask(piece_type, chess.WHITE)) -
+                              chess.popcount(board.pieces_mask(piece_type, chess.BLACK)))
+    minors = board.pawns | board.knights | board.bishops
+    white = board.occupied_co[chess.WHITE] & minors
+    black = board.occupied_co[chess.BLACK] & minors
+    score += 10 * (chess.popcount(white & CENTRE) - chess.popcount(black & CENTRE))
+    score += 5 * (chess.popcount(white & EXTENDED_CENTRE) - chess.popcount(black & EXTENDED_CENTRE))
+    return score if board.turn == chess.WHITE else -score
+
+
+def capture_order(board, move):
+    # Most valuable victim, least valuable attacker
+    victim = board.piece_type_at(move.to_square) or chess.PAWN
+    attacker = board.piece_type_at(move.from_square)
+    return PIECE_VALUES[victim] * 10 - PIECE_VALUES[attacker]
+
+
+def ordered_moves(board, tt_move=None):
+    captures = []
+    quiet = []
+    for move in board.legal_moves:
+        if move == tt_move:
+            continue
+        if board.is_capture(move) or move.promotion:
+            captures.append(move)
+        else:
+            quiet.append(move)
+    captures.sort(key=lambda m: capture_order(board, m), reverse=True)
+    moves = captures + quiet
+    if tt_move is not None:
+        moves.insert(0, tt_move)
+    return moves
+
+
+class SearchContext:
+    def __init__(self, tt, deadline):
+        self.tt = tt
+        self.deadline = deadline
+        self.nodes = 0
+
+    def tick(self):
+        self.nodes += 1
+        if self.deadline is not None and self.nodes & 1023 == 0 and time.time() > self.deadline:
+            raise SearchTimeout()
+
+
+def quiescence(board, alpha, beta, ctx):
+    ctx.tick()
+    stand_pat = evaluate(board)
+    if stand_pat >= beta:
+        return stand_pat
+    alpha = max(alpha, stand_pat)
+
+    captures = [m for m in board.legal_moves if board.is_capture(m)]
+    captures.sort(key=lambda m: capture_order(board, m), reverse=True)
+    for move in captures:
+        board.push(move)
+        score = -quiescence(board, -beta, -alpha, ctx)
+        board.pop()
+        if score >= beta:
+            return score
+        alpha = max(alpha, score)
+    return alpha
+
+
+def negamax(board, depth, alpha, beta, ply, ctx):
+    ctx.tick()
+    if board.is_checkmate():
+        return -MATE + ply
+    if board.is_stalemate() or board.is_insufficient_material() or board.can_claim_fifty_moves():
+        return 0
+    if ply and board.is_repetition(2):
+        return 0
+    if depth <= 0:
+        return quiescence(board, alpha, beta, ctx)
+
+    key = board._transposition_key()
+    entry = ctx.tt.get(key)
+    tt_move = None
+    if entry is not None:
+        entry_depth, entry_score, flag, tt_move = entry
+        if entry_depth >= depth:
+            if flag == EXACT:
+                return entry_score
+            if flag == LOWER and entry_score >= beta:
+                return entry_score
+            if flag == UPPER and entry_score <= alpha:
+                return entry_score
+
+    original_alpha = alpha
+    best_score = -INFINITY
+    best_move = None
+    for move in ordered_moves(board, tt_move):
+        board.push(move)
+        score = -negamax(board, depth - 1, -beta, -alpha, ply + 1, ctx)
+        board.pop()
+        if score > best_score:
+            best_score = score
+            best_move = move
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            break
+
+    if best_score <= original_alpha:
+        flag = UPPER
+    elif best_score >= beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    if len(ctx.tt) > TT_MAX_ENTRIES:
+        ctx.tt.clear()
+    ctx.tt[key] = (depth, best_score, flag, best_move)
+    return best_score
+
+
+# Per-process worker state, set up by the pool initializer
+_shared_scores = None
+_tt = {}
+_tt_search = None
+_search_ids = itertools.count(1)
+
+
+def _init_worker(shared_scores):
+    global _shared_scores
+    _shared_scores = shared_scores
+
+
+def search_root_move(task):
+    # Score one root move, using and raising the search's shared best score
+    global _tt_search
+    board, move, depth, slot, deadline, search_id = task
+    # The table is kept across depths of one search, not between searches
+    if search_id != _tt_search:
+        _tt.clear()
+        _tt_search = search_id
+    ctx = SearchContext(_tt, deadline)
+    alpha = _shared_scores[slot]
+    board.push(move)
+    try:
+        score = -negamax(board, depth - 1, -INFINITY, -alpha, 1, ctx)
+    except SearchTimeout:
+        return move, None, ctx.nodes, False
+    with _shared_scores.get_lock():
+        if score > _shared_scores[slot]:
+            _shared_scores[slot] = score
+    # At or below the window the score is only an upper bound
+    return move, score, ctx.nodes, score > alpha
+
+
+class _LocalScores(list):
+    # Same interface as multiprocessing.Array for the in-process search
+    def __init__(self, size):
+        super().__init__([-INFINITY] * size)
+        self._lock = Lock()
+
+    def get_lock(self):
+        return self._lock
+
+
+class ParallelSearcher:
+    def __init__(self, workers=None, params=None):
+        params = params or config.SEARCH_PARAMS
+        # The configured pool is forked when the app is imported, so it stays small by default
+        self.workers = workers or min(params['workers'], os.cpu_count() or 1)
+        self.slots = params['max_concurrent']
+        self._free_slots = list(range(self.slots))
+        self._slot_lock = Lock()
+        self._slot_semaphore = Semaphore(self.slots)
+        self.pool = None
+        self.scores = None
+        self.searches = 0
+
+    def start(self):
+        # Fork the pool early, before the app starts its background threads
+        global _shared_scores
+        if self.workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+            # Other start methods would re-import the app in every worker
+            print("⚠️ Process forking isn't available here, searching in-process")
+            self.workers = 1
+        if self.workers > 1 and self.pool is None:
+            context = multiprocessing.get_context('fork')
+            self.scores = context.Array('i', [-INFINITY] * self.slots)
+            self.pool = context.Pool(self.workers, initializer=_init_worker, initargs=(self.scores,))
+        elif self.workers <= 1:
+            self.scores = _LocalScores(self.slots)
+            _shared_scores = self.scores
+        return self
+
+    def stop(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def search(self, board, max_depth, time_limit=None):
+        if self.scores is None:
+            self.start()
+
+        start = time.time()
+        deadline = start + time_limit if time_limit else None
+        root_moves = ordered_moves(board)
+        if not root_moves:
+            return SearchResult(None, 0, 0, 0, 0.0, [])
+
+        best_move = root_moves[0]
+        best_score = None
+        completed = 0
+        nodes = 0
+        depth_times = []
+
+        self._slot_semaphore.acquire()
+        with self._slot_lock:
+            slot = self._free_slots.pop()
+            self.searches += 1
+            search_id = (os.getpid(), next(_search_ids))
+        try:
+            for depth in range(1, max_depth + 1):
+                self.scores[slot] = -INFINITY
+                tasks = [(board.copy(), move, depth, slot, deadline, search_id) for move in root_moves]
+                if self.pool is not None:
+                    # The expected best move goes first on its own so the rest start with a real bound
+                    results = [self.pool.apply(search_root_move, (tasks[0],))]
+                    results += self.pool.imap_unordered(search_root_move, tasks[1:])
+                else:
+                    results = [search_root_move(task) for task in tasks]
+
+                nodes += sum(result[2] for result in results)
+                if any(result[1] is None for result in results):
+                    break  # ran out of time mid-depth, keep the last completed one
+
+                # Exact scores rank above bounds that happen to tie with them
+                results.sort(key=lambda result: (result[1], result[3]), reverse=True)
+                best_move, best_score = results[0][0], results[0][1]
+                root_moves = [result[0] for result in results]
+                completed = depth
+                depth_times.append(time.time() - start)
+
+                if abs(best_score) >= MATE - max_depth:
+                    break  # forced mate found
+                if deadline is not None and time.time() > deadline:
+                    break
+        finally:
+            with self._slot_lock:
+                self._free_slots.append(slot)
+            self._slot_semaphore.release()
+
+        return SearchResult(best_move, best_score, completed, nodes, time.time() - start, depth_times)
@@ -0,0 +1,243 @@
+"""
+Crash-safe snapshots of Sachin's in-progress games.
+
+A background thread appends compact records for games that changed since
+the last pass to memory/snapshots/games.log, and a tombstone once a game
+finishes. The log is compacted into a fresh file when it grows well past the
+size of the live records. On startup the log is folded (last record per game
+wins) and the games are restored without replaying any moves, so the server
+can take requests right away; each game's board is replayed from its move log
+in the background, or on demand the first time a request touches the game.
+"""
+
+import os
+import pickle
+import struct
+import time
+import uuid
+from threading import Thread
+
+import chess
+
+import config
+from models import GameState
+
+FRAME = struct.Struct('<IB16s')
+UPSERT = 1
+DELETE = 2
+
+
+def fingerprint(game_state):
+    # Cheap change detector: clocks are stored together with last_move_time, so
+    # only moves and status changes need a fresh record
+    moves = game_state.moves
+    last = moves[-1] if moves else None
+    return len(moves), last, game_state.game_status, game_state.timers_enabled
+
+
+def snapshot_record(game_state):
+    # The move log is already packed, so it is stored as raw bytes
+    return (
+        game_state.username,
+        game_state.human_color,
+        game_state.time_control,
+        game_state.timers[chess.WHITE],
+        game_state.timers[chess.BLACK],
+        game_state.timers_enabled,
+        game_state.last_move_time,
+        game_state.game_status,
+        game_state.bot_loss_streak,
+        game_state.learning_boost_active,
+        game_state.bot_think_time,
+        game_state.bot_moves,
+        dict(game_state.headers),
+        game_state.side_to_move(),
+        game_state.moves.tobytes(),
+        game_state.captures.tobytes(),
+        game_state.sources.tobytes(),
+        game_state.think_times.tobytes(),
+        game_state.clocks.tobytes(),
+    )
+
+
+def restore_game_state(record, clock_policy, now):
+    (username, human_color, time_control, white_time, black_time, timers_enabled,
+     last_move_time, game_status, bot_loss_streak, learning_boost_active,
+     bot_think_time, bot_moves, headers, turn, packed, captures,
+     sources, think_times, clocks) = record
+
+    # 'pause' doesn't charge the side to move for the downtime, 'charge' does
+    if clock_policy == 'pause':
+        last_move_time = now
+
+    game_state = GameState(username, human_color, time_control, 0, timers_enabled, last_move_time)
+    game_state.timers[chess.WHITE] = white_time
+    game_state.timers[chess.BLACK] = black_time
+    game_state.game_status = game_status
+    game_state.bot_loss_streak = bot_loss_streak
+    game_state.learning_boost_active = learning_boost_active
+    game_state.bot_think_time = bot_think_time
+    game_state.bot_moves = bot_moves
+    game_state.headers = headers
+    game_state.moves.frombytes(packed)
+    game_state.captures.frombytes(captures)
+    game_state.sources.frombytes(sources)
+    game_state.think_times.frombytes(think_times)
+    game_state.clocks.frombytes(clocks)
+
+    # The board is rebuilt from the move log by GameState.hydrate
+    game_state.board = None
+    game_state.turn = turn
+    return game_state
+
+
+class GameSnapshotter:
+    def __init__(self, games, lock, params=None):
+        params = params or config.SNAPSHOTS
+        self.games = games
+        self.lock = lock
+        self.path = params['path']
+        self.interval = params['interval']
+        self.compact_ratio = params['compact_ratio']
+        self.clock_policy = params['clock_policy']
+        # game_id -> (fingerprint, payload) of the last record written, which is what a
+        # compaction rewrites, so games that aren't collected again are never dropped
+        self.written = {}
+        self.log_bytes = 0
+        self.snapshots_written = 0
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name='game-snapshots', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.snapshot(wait=False)
+            except Exception as e:
+                print(f"Error writing game snapshots: {e}")
+
+    def collect(self, wait=True):
+        # Copy out records for games that changed, each under its own game lock;
+        # without wait, games busy with a move are left for the next snapshot
+        upserts = []
+        deletes = []
+        with self.lock:
+            live = list(self.games.items())
+        for game_id, game_state in live:
+            if not game_state.lock.acquire(blocking=wait):
+                continue
+            try:
+                if game_state.game_status != 'active':
+                    if game_id in self.written:
+                        deletes.append(game_id)
+                    continue
+                fp = fingerprint(game_state)
+                previous = self.written.get(game_id)
+                if previous is None or previous[0] != fp:
+                    upserts.append((game_id, fp, snapshot_record(game_state)))
+            finally:
+                game_state.lock.release()
+        with self.lock:
+            for game_id in self.written:
+                if game_id not in self.games and game_id not in deletes:
+                    deletes.append(game_id)
+        return upserts, deletes
+
+    def snapshot(self, wait=True):
+        upserts, deletes = self.collect(wait)
+        if not upserts and not deletes:
+            return 0
+
+        chunks = []
+        for game_id, fp, record in upserts:
+            payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+            chunks.append(FRAME.pack(len(payload), UPSERT, uuid.UUID(game_id).bytes) + payload)
+            self.written[game_id] = (fp, payload)
+        for game_id in deletes:
+            chunks.append(FRAME.pack(0, DELETE, uuid.UUID(game_id).bytes))
+            self.written.pop(game_id, None)
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = b''.join(chunks)
+        with open(self.path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.log_bytes += len(data)
+        self.snapshots_written += len(upserts)
+
+        live_bytes = sum(len(payload) + FRAME.size for _, payload in self.written.values())
+        if self.log_bytes > self.compact_ratio * max(live_bytes, 1 << 16):
+            self.compact()
+        return len(upserts)
+
+    def compact(self):
+        # Rewrite the log with the last record of each live game, without touching any game lock
+        tmp_file = f"{self.path}.tmp"
+        size = 0
+        with open(tmp_file, 'wb') as f:
+            for game_id, (_, payload) in self.written.items():
+                f.write(FRAME.pack(len(payload), UPSERT, uuid.UUID(game_id).bytes) + payload)
+                size += len(payload) + FRAME.size
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.path)
+        self.log_bytes = size
+
+    def read_log(self):
+        # game_id -> latest record, folding upserts and tombstones
+        records = {}
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return records
+
+        offset = 0
+        while offset + FRAME.size <= len(data):
+            length, op, raw_id = FRAME.unpack_from(data, offset)
+            offset += FRAME.size
+            if offset + length > len(data):
+                break  # torn write at the end of the log
+            game_id = str(uuid.UUID(bytes=raw_id))
+            if op == UPSERT:
+                records[game_id] = data[offset:offset + length]
+            else:
+                records.pop(game_id, None)
+            offset += length
+        self.log_bytes = offset
+        return records
+
+    def restore(self, hydrate=True):
+        # Load every live game from the log into the games dict
+        start = time.perf_counter()
+        now = time.time()
+        records = self.read_log()
+        restored = {}
+        for game_id, payload in records.items():
+            game_state = restore_game_state(pickle.loads(payload), self.clock_policy, now)
+            restored[game_id] = game_state
+            self.written[game_id] = (fingerprint(game_state), payload)
+
+        with self.lock:
+            self.games.update(restored)
+
+        if restored and hydrate:
+            Thread(target=self.hydrate_all, args=(list(restored),), name='game-hydrate', daemon=True).start()
+
+        elapsed = time.perf_counter() - start
+        print(f"♻️ Restored {len(restored)} active games from snapshots in {elapsed:.3f}s")
+        return len(restored), elapsed
+
+    def hydrate_all(self, game_ids):
+        for game_id in game_ids:
+            with self.lock:
+                game_state = self.games.get(game_id)
+            if game_state is not None:
+                with game_state.lock:
+                    game_state.hydrate()
@@ -43,7 +43,10 @@ document.querySelectorAll('.time-option').forEach(option => {
 
 startGameBtn.addEventListener('click', function() {
     const name = playerNameInput.value.trim();
-    if (name) {
+    // Names become file names on the server, which only accepts these characters
+    if (name && !/^[A-Za-z0-9_-]{1,32}$/.test(name)) {
+        alert('Names can only use letters, numbers, - and _ (up to 32 characters)');
+    } else if (name) {
         gameState.playerName = name;
         playerNameDisplay.textContent = name;
         setupScreen.style.display = 'none';
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Endgame tables for Sachin's small-material endings.
+
+Each material signature (KQvK, KRvK, KPvK, ...) gets a distance-to-mate
+table built offline by retrograde analysis. Every legal position is linked
+to its successors once, then mates are propagated backwards through the
+predecessors one ply at a time: a position is won as soon as one successor
+is lost for the opponent, and lost once every successor is won for them.
+Captures and promotions lead into smaller tables, generated first as
+needed; anything left unresolved is a draw.
+
+A table is one byte per (side to move, piece squares) index, memory-mapped
+for probing. The byte is 0 for a draw, 255 for an impossible position, and
+otherwise the distance to mate in plies plus one, from the side to move's
+point of view: even values are wins, odd values are losses.
+
+Tables are stored with the stronger side as White. Positions where Black
+holds the stronger material are probed on the mirrored board.
+
+Generate the configured tables:
+
+    python tablebase.py --generate
+    python tablebase.py --generate KQvK KRvK
+"""
+
+import argparse
+import itertools
+import mmap
+import os
+from array import array
+from threading import Lock
+
+import chess
+
+import config
+from canonical import mirror_move
+
+DRAW = 0
+INVALID = 255
+MAX_PIECES = 4
+ORDER = (chess.KING, chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT, chess.PAWN)
+PIECE_VALUES = {chess.KING: 0, chess.QUEEN: 9, chess.ROOK: 5, chess.BISHOP: 3, chess.KNIGHT: 3, chess.PAWN: 1}
+
+
+def parse_signature(signature):
+    # 'KQvK' -> [(WHITE, KING), (WHITE, QUEEN), (BLACK, KING)]
+    try:
+        white, black = signature.upper().split('V')
+    except ValueError:
+        raise ValueError(f"Bad material signature: {signature}")
+    pieces = []
+    for color, letters in ((chess.WHITE, white), (chess.BLACK, black)):
+        if letters.count('K') != 1:
+            raise ValueError(f"Each side needs exactly one king: {signature}")
+        for letter in sorted(letters, key=lambda l: ORDER.index(chess.PIECE_SYMBOLS.index(l.lower()))):
+            pieces.append((color, chess.PIECE_SYMBOLS.index(letter.lower())))
+    if len(pieces) > MAX_PIECES:
+        raise ValueError(f"Tables cover at most {MAX_PIECES} pieces: {signature}")
+    return pieces
+
+
+def side_letters(board, color):
+    return ''.join(chess.piece_symbol(piece_type).upper() * chess.popcount(board.pieces_mask(piece_type, color))
+                   for piece_type in ORDER)
+
+
+def material_signature(board):
+    return f"{side_letters(board, chess.WHITE)}v{side_letters(board, chess.BLACK)}"
+
+
+def material_value(board, color):
+    return sum(PIECE_VALUES[piece_type] * chess.popcount(board.pieces_mask(piece_type, color))
+               for piece_type in ORDER)
+
+
+def normalize_signature(signature):
+    pieces = parse_signature(signature)
+    board = chess.Board(None)
+    for square, (color, piece_type) in enumerate(pieces):
+        board.set_piece_at(square, chess.Piece(piece_type, color))
+    return material_signature(board)
+
+
+def mirrored_signature(signature):
+    white, black = signature.split('v')
+    return f"{black}v{white}"
+
+
+def is_win(value):
+    return value != DRAW and value != INVALID and value % 2 == 0
+
+
+def is_loss(value):
+    return value != INVALID and value % 2 == 1
+
+
+class Table:
+    def __init__(self, signature, data):
+        self.signature = signature
+        self.pieces = parse_signature(signature)
+        self.per_side = 64 ** len(self.pieces)
+        self.data = data
+        # (color, piece type, [slot, ...]); identical pieces fill their slots in square order
+        self.groups = []
+        for slot, (color, piece_type) in enumerate(self.pieces):
+            if self.groups and self.groups[-1][:2] == (color, piece_type):
+                self.groups[-1][2].append(slot)
+            else:
+                self.groups.append((color, piece_type, [slot]))
+
+    def index(self, board):
+        index = 0 if board.turn == chess.WHITE else self.per_side
+        for color, piece_type, slots in self.groups:
+            for slot, square in zip(slots, chess.scan_forward(board.pieces_mask(piece_type, color))):
+                index += square << (6 * slot)
+        return index
+
+    def probe(self, board):
+        return self.data[self.index(board)]
+
+
+def table_path(directory, signature):
+    return os.path.join(directory, f"{signature}.tb")
+
+
+class EndgameTables:
+    def __init__(self, directory=None, signatures=None):
+        params = config.ENDGAME_TABLES
+        self.directory = directory or params['directory']
+        self.signatures = [normalize_signature(s) for s in (signatures or params['signatures'])]
+        self.tables = {}
+        self.lock = Lock()
+        self.probes = 0
+        self.hits = 0
+
+    def load(self):
+        for signature in self.signatures:
+            path = table_path(self.directory, signature)
+            if signature in self.tables or not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.add(Table(signature, data))
+        if self.tables:
+            print(f"♟️ Loaded endgame tables: {', '.join(sorted(self.tables))}")
+        return self
+
+    def add(self, table):
+        expected = 2 * table.per_side
+        if len(table.data) != expected:
+            raise ValueError(f"{table.signature} table has {len(table.data)} entries, expected {expected}")
+        self.tables[table.signature] = table
+
+    def lookup(self, board):
+        # (table, board in the table's frame, mirrored) or None when not covered
+        if board.castling_rights or board.has_legal_en_passant():
+            return None
+        if chess.popcount(board.occupied) > MAX_PIECES:
+            return None
+        signature = material_signature(board)
+        table = self.tables.get(signature)
+        if table is not None:
+            return table, board, False
+        table = self.tables.get(mirrored_signature(signature))
+        if table is not None:
+            return table, board.mirror(), True
+        return None
+
+    def value(self, board):
+        # Table byte from the side to move's point of view, or None when not covered
+        if board.is_insufficient_material():
+            return DRAW
+        found = self.lookup(board)
+        if found is None:
+            return None
+        table, board, _ = found
+        return table.probe(board)
+
+    def best_move(self, board):
+        # Fastest mate when winning, a move that holds the draw, the longest defence when losing
+        if chess.popcount(board.occupied) > MAX_PIECES:
+            return None
+        with self.lock:
+            self.probes += 1
+        found = self.lookup(board)
+        if found is None:
+            return None
+        table, canonical, flipped = found
+        if table.probe(canonical) == INVALID:
+            return None
+        if not flipped:
+            canonical = canonical.copy(stack=False)
+
+        best = None
+        best_rank = None
+        for move in canonical.legal_moves:
+            canonical.push(move)
+            child = self.value(canonical)
+            canonical.pop()
+            if child is None:
+                rank = (1, 1)  # leads into an ending without a table
+            elif is_loss(child):
+                rank = (0, child)
+            elif is_win(child):
+                rank = (2, -child)
+            else:
+                rank = (1, 0)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = move, rank
+        if best is None:
+            return None
+
+        with self.lock:
+            self.hits += 1
+        return mirror_move(best) if flipped else best
+
+    def stats(self):
+        with self.lock:
+            return {
+                'tables': sorted(self.tables),
+                'probes': self.probes,
+                'hits': self.hits,
+            }
+
+
+def generate_table(signature, tables):
+    # Retrograde analysis of one signature; smaller tables it leads into come from (or are added to) tables
+    pieces = parse_signature(signature)
+    count = len(pieces)
+    per_side = 64 ** count
+    size = 2 * per_side
+    values = bytearray([INVALID]) * size
+    remaining = bytearray(size)   # successors not yet known to be won for the opponent
+    longest = bytearray(size)     # longest of the opponent's wins among successors
+    edges_from = array('I')       # child index for every move inside this table
+    edges_to = array('I')         # parent index for the same move
+    buckets = [[]]
+
+    def bucket(plies):
+        while len(buckets) <= plies:
+            buckets.append([])
+        return buckets[plies]
+
+    def external_value(board):
+        value = tables.value(board)
+        if value is None:
+            # A capture or promotion into an ending we haven't built yet, stronger side as White
+            child = material_signature(board)
+            if material_value(board, chess.BLACK) > material_value(board, chess.WHITE):
+                child = mirrored_signature(child)
+            tables.add(Table(child, generate_table(child, tables)))
+            value = tables.value(board)
+        return value
+
+    board = chess.Board(None)
+    for turn_offset, turn in ((0, chess.WHITE), (per_side, chess.BLACK)):
+        for squares in itertools.product(range(64), repeat=count):
+            if len(set(squares)) < count:
+                continue
+            if any(piece_type == chess.PAWN and chess.square_rank(square) in (0, 7)
+                   for (_, piece_type), square in zip(pieces, squares)):
+                continue
+            board.clear_board()
+            for (color, piece_type), square in zip(pieces, squares):
+                board.set_piece_at(square, chess.Piece(piece_type, color))
+            board.turn = turn
+            if not board.is_valid():
+                continue
+
+            index = turn_offset
+            slots = {}
+            for slot, square in enumerate(squares):
+                index += square << (6 * slot)
+                slots[square] = slot
+            child_offset = per_side - turn_offset
+            moves = 0
+            open_moves = 0
+            for move in board.generate_legal_moves():
+                moves += 1
+                if move.promotion or board.piece_at(move.to_square) or board.is_en_passant(move):
+                    board.push(move)
+                    child = external_value(board)
+                    board.pop()
+                    if is_loss(child):
+                        bucket(child).append(index)  # mate in one more ply than the child's
+                        open_moves += 1
+                    elif is_win(child):
+                        longest[index] = max(longest[index], child - 1)
+                    else:
+                        open_moves += 1
+                else:
+                    slot = slots[move.from_square]
+                    child = index - turn_offset + child_offset + ((move.to_square - move.from_square) << (6 * slot))
+                    edges_from.append(child)
+                    edges_to.append(index)
+                    open_moves += 1
+
+            values[index] = DRAW
+            remaining[index] = open_moves
+            if moves == 0:
+                if board.is_check():
+                    bucket(0).append(index)
+            elif open_moves == 0:
+                bucket(longest[index] + 1).append(index)
+
+    # Predecessor lists, grouped by child index
+    offsets = array('I', bytes(4 * (size + 1)))
+    for child in edges_from:
+        offsets[child + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+    predecessors = array('I', bytes(4 * len(edges_from)))
+    fill = array('I', offsets)
+    for child, parent in zip(edges_from, edges_to):
+        predecessors[fill[child]] = parent
+        fill[child] += 1
+    del edges_from, edges_to, fill
+
+    resolved = bytearray(size)
+    plies = 0
+    while plies < len(buckets):
+        for index in buckets[plies]:
+            if resolved[index]:
+                continue
+            resolved[index] = 1
+            values[index] = plies + 1
+            parents = predecessors[offsets[index]:offsets[index + 1]]
+            if plies % 2 == 0:
+                # Lost for the side to move: every parent can win by moving here
+                for parent in parents:
+                    if not resolved[parent]:
+                        bucket(plies + 1).append(parent)
+            else:
+                # Won for the side to move: one fewer escape for every parent
+                for parent in parents:
+                    if not resolved[parent]:
+                        remaining[parent] -= 1
+                        longest[parent] = max(longest[parent], plies)
+                        if remaining[parent] == 0:
+                            bucket(longest[parent] + 1).append(parent)
+        buckets[plies] = None
+        plies += 1
+        if plies >= INVALID - 1:
+            raise ValueError(f"{signature} has mates longer than a table byte can hold")
+    return values
+
+
+def save_table(directory, signature, values):
+    os.makedirs(directory, exist_ok=True)
+    path = table_path(directory, signature)
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(values)
+    os.replace(tmp_file, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate endgame tables by retrograde analysis')
+    parser.add_argument('--generate', action='store_true', help='build the tables and save them')
+    parser.add_argument('signatures', nargs='*', help='material signatures (default: config.ENDGAME_TABLES)')
+    parser.add_argument('--directory', default=config.ENDGAME_TABLES['directory'])
+    args = parser.parse_args()
+
+    if not args.generate:
+        parser.print_help()
+        return
+
+    tables = EndgameTables(args.directory, args.signatures or None).load()
+    for signature in tables.signatures:
+        if signature in tables.tables:
+            print(f"✅ {signature} already generated")
+            continue
+        before = set(tables.tables)
+        tables.add(Table(signature, generate_table(signature, tables)))
+        for generated in sorted(set(tables.tables) - before):
+            values = tables.tables[generated].data
+            path = save_table(args.directory, generated, values)
+            wins = sum(1 for v in values if is_win(v))
+            losses = sum(1 for v in values if is_loss(v))
+            longest = max((v - 1 for v in values if v != INVALID), default=0)
+            print(f"✅ {generated}: {wins} won, {losses} lost, longest mate {longest} plies -> {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+import atexit
+import os
+
+import pytest
+
+import config
+
+
+@pytest.fixture(scope='session')
+def client(tmp_path_factory):
+    # The app creates its data directories, loads policies and starts writer threads on
+    # import, so it runs inside a scratch directory with the periodic writers idle
+    os.chdir(tmp_path_factory.mktemp('sachin'))
+    config.SEARCH_PARAMS['workers'] = 1
+    config.SNAPSHOTS['interval'] = 3600
+    config.POLICY_MAINTENANCE['interval'] = 3600
+    config.POLICY_STORE['watch_interval'] = None
+    import app
+    yield app, app.app.test_client()
+
+    # pytest goes back to the starting directory at exit, write everything out before that
+    app.finalizer.flush()
+    app.learner.flush()
+    for handler in (app.snapshotter.snapshot, app.explorer.merge, app.learner.stop, app.finalizer.stop):
+        atexit.unregister(handler)
@@ -0,0 +1,75 @@
+import time
+from threading import Thread
+
+import pytest
+
+from admission import FULL, HEURISTIC, Overloaded, RouteGate
+
+
+def gate(critical, max_queue):
+    return RouteGate('test', max_active=1, max_queue=max_queue, critical=critical, max_wait=None,
+                     degrade_policy_at=0.5, degrade_heuristic_at=1.0)
+
+
+def wait_for_queue(route_gate, depth):
+    deadline = time.monotonic() + 5
+    while len(route_gate.waiting) != depth and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert len(route_gate.waiting) == depth
+
+
+def queue(route_gate, priority, outcomes):
+    # Runs admit() on its own thread, recording the ticket's mode or the Overloaded error
+    def run():
+        try:
+            with route_gate.admit(priority) as ticket:
+                outcomes[priority] = (ticket.mode, ticket.queued)
+        except Overloaded as e:
+            outcomes[priority] = e
+
+    thread = Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+@pytest.mark.parametrize('critical', [False, True])
+def test_urgent_newcomer_displaces_least_urgent_waiter(critical):
+    route_gate = gate(critical, max_queue=2)
+    outcomes = {}
+    holder = route_gate.admit(0)
+    threads = [queue(route_gate, 50, outcomes)]
+    wait_for_queue(route_gate, 1)
+    threads.append(queue(route_gate, 90, outcomes))
+    wait_for_queue(route_gate, 2)
+
+    # Less urgent than everyone queued, turned away itself
+    threads.append(queue(route_gate, 95, outcomes))
+    threads[-1].join(5)
+    # More urgent than the 90 waiter, which is turned away in its place
+    threads.append(queue(route_gate, 10, outcomes))
+    threads[1].join(5)
+    assert sorted(priority for priority, _ in route_gate.waiting) == [10, 50]
+
+    holder.__exit__()
+    for thread in threads:
+        thread.join(5)
+    assert route_gate.evictions == 1
+    for priority in (90, 95):
+        if critical:
+            assert outcomes[priority] == (HEURISTIC, False)
+        else:
+            assert isinstance(outcomes[priority], Overloaded)
+    assert outcomes[10][1] and outcomes[50][1]
+
+
+def test_mode_is_decided_at_admission():
+    route_gate = gate(False, max_queue=2)
+    outcomes = {}
+    holder = route_gate.admit(0)
+    # Half the queue is full while it waits, but nobody is behind it once it gets in
+    thread = queue(route_gate, 10, outcomes)
+    wait_for_queue(route_gate, 1)
+    assert route_gate._mode() != FULL
+    holder.__exit__()
+    thread.join(5)
+    assert outcomes[10] == (FULL, True)
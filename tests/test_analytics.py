@@ -0,0 +1,36 @@
+import io
+
+import chess
+import chess.pgn
+
+from analytics import GameAnalytics
+
+
+def test_live_games_bucket_like_the_backfill(client):
+    app, c = client
+    game_id = c.post('/api/new_game', json={'username': 'bucketer', 'player_color': 'white',
+                                            'time_control': 'foo'}).get_json()['game_id']
+    c.post('/api/move', json={'game_id': game_id, 'from': 'e2', 'to': 'e4'})
+    c.post('/api/resign', json={'game_id': game_id})
+    app.finalizer.flush()
+
+    live = app.analytics.get('bucketer')['by_time_control']
+    headers = app.get_game(game_id).headers
+    game = chess.pgn.read_game(io.StringIO(
+        ''.join(f'[{name} "{value}"]\n' for name, value in headers.items()) + '\n1. e4 0-1\n'))
+    backfilled = GameAnalytics(memory_dir='unused')
+    backfilled.record_pgn(game, backfill=True)
+    assert 'foo' not in live
+    assert set(live) == set(backfilled.aggregates['bucketer']['by_time_control'])
+
+
+def test_published_views_never_change(tmp_path):
+    analytics = GameAnalytics(memory_dir=str(tmp_path))
+    moves = [chess.Move.from_uci(uci) for uci in ('e2e4', 'e7e5')]
+    analytics.record_game('viewer', chess.WHITE, '10 min', '1-0', moves)
+    view = analytics.get('viewer')
+    snapshot = repr(view)
+
+    analytics.record_game('viewer', chess.WHITE, '10 min', '0-1', moves)
+    assert repr(view) == snapshot
+    assert analytics.get('viewer')['by_opening']['e4 e5']['games'] == 2
@@ -0,0 +1,35 @@
+import os
+
+import chess.pgn
+import pytest
+
+import config
+from encoding import append_record, pack_pgn_game
+
+np = pytest.importorskip('numpy')
+
+import evaluation  # noqa: E402
+
+GAMES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), config.GAMES_DIR)
+
+
+def test_archive_and_pgn_training_agree(tmp_path):
+    # The packed archive holds the same games as the PGN files, so both fit the same weights
+    archive = str(tmp_path / 'archive.sgr')
+    for filename in sorted(os.listdir(GAMES_DIR)):
+        if not filename.endswith('.pgn'):
+            continue
+        with open(os.path.join(GAMES_DIR, filename), 'r') as f:
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                record = pack_pgn_game(game)
+                if record:
+                    append_record(archive, record)
+
+    params = dict(config.EVAL_PARAMS, epochs=3)
+    from_pgn = evaluation.train(GAMES_DIR, params)
+    from_archive = evaluation.train(GAMES_DIR, params, archive=archive)
+    assert from_archive[1] == from_pgn[1] > 0
+    assert np.allclose(from_archive[0], from_pgn[0])
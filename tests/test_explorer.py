@@ -0,0 +1,100 @@
+import threading
+import time
+
+import chess
+import chess.pgn
+
+from explorer import ExplorerIndex
+
+GAMES = [
+    ('e2e4 e7e5 g1f3 b8c6 f1b5', '1-0'),
+    ('e2e4 c7c5 g1f3 d7d6', '0-1'),
+    ('d2d4 d7d5 c2c4', '1/2-1/2'),
+    ('e2e4 e7e5 f1c4', '*'),
+]
+
+
+def write_game(directory, name, ucis, result):
+    board = chess.Board()
+    for uci in ucis.split():
+        board.push_uci(uci)
+    game = chess.pgn.Game.from_board(board)
+    game.headers['Result'] = result
+    (directory / name).write_text(str(game) + '\n\n')
+    return [chess.Move.from_uci(uci) for uci in ucis.split()]
+
+
+def snapshot(index, lines):
+    # lookup() of every position along the given games
+    found = {}
+    for ucis, _ in lines:
+        board = chess.Board()
+        for uci in ucis.split():
+            found[board.fen()] = index.lookup(board)
+            board.push_uci(uci)
+    return found
+
+
+def test_merge_matches_full_build(tmp_path):
+    games_dir = tmp_path / 'games'
+    games_dir.mkdir()
+    for i, (ucis, result) in enumerate(GAMES[:2]):
+        write_game(games_dir, f'{i}.pgn', ucis, result)
+    index = ExplorerIndex(str(tmp_path / 'explorer.idx'), (str(games_dir),))
+    index.build()
+
+    # Games saved later stay in the overlay until they are merged
+    for i, (ucis, result) in enumerate(GAMES[2:], start=2):
+        index.add_game(f'{i}.pgn', write_game(games_dir, f'{i}.pgn', ucis, result), result)
+    before = snapshot(index, GAMES)
+    assert index.merge() > 0
+    assert not index.overlay
+    assert snapshot(index, GAMES) == before
+
+    rebuilt = ExplorerIndex(str(tmp_path / 'rebuilt.idx'), (str(games_dir),))
+    rebuilt.build()
+    assert rebuilt.count == index.count
+    assert snapshot(rebuilt, GAMES) == before
+
+    # The merged index already covers every file, so a restart has nothing to read
+    reopened = ExplorerIndex(str(tmp_path / 'explorer.idx'), (str(games_dir),)).open()
+    assert reopened.index_new_files() == 0
+    assert snapshot(reopened, GAMES) == before
+
+
+def test_new_files_indexed_in_background(tmp_path):
+    games_dir = tmp_path / 'games'
+    games_dir.mkdir()
+    for i, (ucis, result) in enumerate(GAMES):
+        write_game(games_dir, f'{i}.pgn', ucis, result)
+    index = ExplorerIndex(str(tmp_path / 'explorer.idx'), (str(games_dir),)).open()
+    assert index.count == 0
+
+    assert index.start().caught_up.wait(5)
+    assert index.indexed_files == {f'{i}.pgn' for i in range(len(GAMES))}
+    assert index.count > 0 and not index.overlay
+    assert index.lookup(chess.Board())[chess.Move.from_uci('e2e4')] == [3, 1, 1, 0]
+
+
+def test_saved_games_are_merged_off_the_callers_thread(tmp_path):
+    games_dir = tmp_path / 'games'
+    games_dir.mkdir()
+    index = ExplorerIndex(str(tmp_path / 'explorer.idx'), (str(games_dir),), overlay_max_positions=3).open()
+    merges = []
+    merge = index.merge
+    index.merge = lambda: merges.append(threading.current_thread().name) or merge()
+
+    # Without the explorer thread a save only grows the overlay
+    ucis, result = GAMES[0]
+    index.add_game('0.pgn', write_game(games_dir, '0.pgn', ucis, result), result)
+    assert merges == [] and index.count == 0
+
+    assert index.start().caught_up.wait(5)
+    for i, (ucis, result) in enumerate(GAMES[1:], start=1):
+        index.add_game(f'{i}.pgn', write_game(games_dir, f'{i}.pgn', ucis, result), result)
+    deadline = time.monotonic() + 5
+    while (index.overlay or index.merging) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not index.overlay and index.count > 0
+    assert set(merges) == {'explorer-indexer'}
+    assert index.lookup(chess.Board())[chess.Move.from_uci('e2e4')] == [3, 1, 1, 0]
@@ -0,0 +1,27 @@
+from threading import Thread
+
+import chess
+
+from canonical import policy_key
+
+
+def test_own_saves_never_reload(client, monkeypatch):
+    app, _ = client
+    loads = []
+    monkeypatch.setattr(app.maintainer, 'load', loads.append)
+    key, _ = policy_key(chess.Board())
+    with app.policies['jakhar'].write() as writer:
+        writer.entry(key)['e2e4'] = 1
+    app.save_policy('jakhar')
+    app.policy_watcher.check()
+
+    # Poll as fast as possible while the server keeps saving, none of it is an external write
+    reloaded = []
+    saver = Thread(target=lambda: [app.save_policy('jakhar') for _ in range(300)])
+    saver.start()
+    while saver.is_alive():
+        reloaded += app.policy_watcher.check()
+    saver.join()
+    reloaded += app.policy_watcher.check()
+    assert reloaded == []
+    assert loads == []
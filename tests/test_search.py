@@ -0,0 +1,13 @@
+import multiprocessing
+
+import chess
+
+from search import ParallelSearcher
+
+
+def test_searches_in_process_without_fork(monkeypatch):
+    monkeypatch.setattr(multiprocessing, 'get_all_start_methods', lambda: ['spawn'])
+    searcher = ParallelSearcher(workers=2).start()
+    assert searcher.pool is None and searcher.workers == 1
+    result = searcher.search(chess.Board(), 2)
+    assert result.move in chess.Board().legal_moves and result.depth == 2
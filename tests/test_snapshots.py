@@ -0,0 +1,67 @@
+import uuid
+from threading import Event, RLock, Thread
+
+import chess
+
+import config
+from models import GameState
+from snapshots import GameSnapshotter
+
+
+def test_periodic_snapshot_skips_busy_games(client):
+    app, c = client
+    game_id = c.post('/api/new_game', json={'username': 'jakhar', 'player_color': 'white',
+                                            'time_control': '30 min'}).get_json()['game_id']
+    c.post('/api/move', json={'game_id': game_id, 'from': 'e2', 'to': 'e4'})
+    game_state = app.get_game(game_id)
+
+    # Stand in for a bot search holding the game lock
+    held, release = Event(), Event()
+
+    def search():
+        with game_state.lock:
+            held.set()
+            release.wait(5)
+
+    searcher = Thread(target=search)
+    searcher.start()
+    held.wait(5)
+    try:
+        upserts, _ = app.snapshotter.collect(wait=False)
+        assert game_id not in [upsert[0] for upsert in upserts]
+    finally:
+        release.set()
+        searcher.join()
+
+    upserts, _ = app.snapshotter.collect(wait=False)
+    assert game_id in [upsert[0] for upsert in upserts]
+
+
+def snapshotter(path, games=None):
+    return GameSnapshotter({} if games is None else games, RLock(),
+                           dict(config.SNAPSHOTS, path=str(path), clock_policy='charge'))
+
+
+def test_restore_compact_restore_keeps_unhydrated_games(tmp_path):
+    path = tmp_path / 'games.log'
+    games = {}
+    for i, ucis in enumerate(['e2e4 e7e5 g1f3', 'd2d4', 'c2c4 e7e5']):
+        game_state = GameState('jakhar', chess.WHITE, '30 min', 1800, True, 100.0)
+        for uci in ucis.split():
+            game_state.push(chess.Move.from_uci(uci))
+        games[str(uuid.UUID(int=i + 1))] = game_state
+    snapshotter(path, games).snapshot()
+
+    # Nothing has been hydrated yet: the first pass has nothing new, and compaction keeps every game
+    restored = snapshotter(path)
+    assert restored.restore(hydrate=False)[0] == 3
+    assert restored.snapshot(wait=False) == 0
+    restored.compact()
+
+    again = snapshotter(path)
+    assert again.restore(hydrate=False)[0] == 3
+    for game_id, game_state in games.items():
+        copy = again.games[game_id]
+        assert copy.board is None and copy.side_to_move() == game_state.board.turn
+        assert copy.move_list() == game_state.move_list()
+        assert copy.hydrate().board.fen() == game_state.board.fen()
@@ -0,0 +1,16 @@
+def test_undo_after_finish_is_rejected(client):
+    app, c = client
+    game_id = c.post('/api/new_game', json={'username': 'jakhar', 'player_color': 'white',
+                                            'time_control': '1 min'}).get_json()['game_id']
+    c.post('/api/move', json={'game_id': game_id, 'from': 'e2', 'to': 'e4'})
+    c.post('/api/bot_move', json={'game_id': game_id})
+    assert c.post('/api/resign', json={'game_id': game_id}).get_json()['status'] == 'finished'
+
+    response = c.post('/api/undo', json={'game_id': game_id, 'count': 2})
+    assert response.status_code == 400
+
+    # The game stays finished, and its clock isn't charged again
+    game_state = app.get_game(game_id)
+    assert game_state.game_status == 'finished'
+    assert game_state.ply_count() == 2
+    assert c.get(f'/api/timers?game_id={game_id}').get_json()['status'] == 'finished'
@@ -0,0 +1,40 @@
+import io
+import os
+
+import chess.pgn
+import pytest
+
+BAD_NAMES = ['../escape', '..', 'a/b', 'a b', '', 'x' * 33]
+
+
+@pytest.mark.parametrize('username', BAD_NAMES)
+def test_unsafe_usernames_are_rejected(client, username):
+    app, c = client
+    before = set(os.listdir('.'))
+    response = c.post('/api/new_game', json={'username': username, 'player_color': 'white',
+                                             'time_control': '1 min'})
+    assert response.status_code == 400
+    assert c.get('/api/stats', query_string={'username': username}).status_code == 400
+    assert c.get('/api/export/policy', query_string={'username': username}).status_code == 400
+    assert set(os.listdir('.')) == before
+    with pytest.raises(ValueError):
+        app.user_dir(username)
+
+
+def test_safe_username_plays(client):
+    _, c = client
+    response = c.post('/api/new_game', json={'username': 'Guest_1-b', 'player_color': 'white',
+                                             'time_control': '1 min'})
+    assert response.status_code == 200
+
+
+def test_analytics_never_leaves_memory_dir(client, tmp_path):
+    app, c = client
+    assert c.get('/api/analytics', query_string={'username': '../escape'}).status_code == 400
+
+    analytics = app.GameAnalytics(memory_dir=str(tmp_path / 'memory'))
+    with pytest.raises(ValueError):
+        analytics.get('../escape')
+    game = chess.pgn.read_game(io.StringIO('[White "../../escape"]\n[Black "Sachin"]\n[Result "1-0"]\n\n1. e4 e5 1-0\n'))
+    assert analytics.record_pgn(game, backfill=True) is None
+    assert not (tmp_path / 'escape').exists()